@@ -1,151 +1,512 @@
-import c_instruction as Cinst
+import lexer
+import peephole
 import symbol as Symbol
-import re
 import os, sys
+import io, tempfile
+import argparse
+import json
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
 
-# remove comment and empty space from line
-def trim(line):
-    # ignore line breaks
-    if line[0] == "\n":
-        return ""
-    # remove all white spaces
-    line = "".join(line.split())
-    # ignore comments
-    commentIndex = line.find("//")
-    if commentIndex == -1:  # if no comment
-        return line  # return line
-    else:
-        if commentIndex == 0:  # detect comments next to code
-            return ""
-        else:  # otherwise full-line comments
-            return line[:commentIndex]
+# memory location for variabels starts from index 16
+VARIABLE_BASE = 16
+# 32K words of ROM, variables live below the screen map at 16384
+ROM_SIZE = 32768
+RAM_BUDGET = Symbol.table["SCREEN"] - VARIABLE_BASE
 
 
-# convert C instruction as (dest = comp ; jump)
-def normalize(line):
-    line = line.strip()
-    if not ";" in line:  # e.g. D=M => D=M;null
-        line = line + ";null"
-    if not "=" in line:  # e.g. D;JMP => null=D;JMP
-        line = "null=" + line
-    return line
+def isFunction(label):
+    """VM function entry, e.g. `Foo.bar` (not `Foo.bar$LOOP` or `BOOL.3`)"""
+    name, dot, member = label.partition(".")
+    return bool(dot and member) and "$" not in label and not member[0].isdigit()
 
 
-# memory location for variabels starts from index 16
-variableIndex = 16
+def functionLabels(labels):
+    """`isFunction` labels that are not local to another one, e.g. the
+    local-init loop `LOOP_screen.drawline` belongs to `screen.drawline`
+    (a prefix ending in "_", so `PongGame.run` stays apart from `Game.run`)
+    """
+    candidates = {label for label in labels if isFunction(label)}
+    return [
+        label
+        for label in candidates
+        if not any(
+            label[i - 1] == "_" and label[i:] in candidates
+            for i in range(1, label.index("."))
+        )
+    ]
 
-# add variables and return address
-def addVariable(label):
-    """Add a label to the table
 
-    Args:
-        label (`str`)
+def sizeBreakdown(labels, romSize, top=10):
+    """Largest ROM consumers, by label and by file
+
+    Every address belongs to the closest function label before it
+    (`Foo.bar`, see `functionLabels`), or to the closest label of any kind when the program has
+    no function labels; files group them by the prefix before the dot.
 
     Returns:
-        `address` of new label
+        `lines` of the report
     """
-    global variableIndex
-    Symbol.table[label] = variableIndex
-    variableIndex += 1  # increase index for next var
-    return Symbol.table[label]
+    owners = functionLabels(labels)
+    if not owners:  # hand-written assembly
+        owners = list(labels)
+    starts = sorted([(labels[label], label) for label in owners])
+    if not starts or starts[0][0] > 0:  # code before the first label
+        starts.insert(0, (0, "(start)"))
+    byLabel, byFile = {}, {}
+    for i, (address, label) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else romSize
+        byLabel[label] = byLabel.get(label, 0) + end - address
+        fileName = label.split(".")[0]
+        byFile[fileName] = byFile.get(fileName, 0) + end - address
+
+    lines = [f"largest labels (of {romSize} words):"]
+    for label, size in sorted(byLabel.items(), key=lambda x: -x[1])[:top]:
+        lines.append(f"  {size:>6}  {label}")
+    lines.append("largest files:")
+    for fileName, size in sorted(byFile.items(), key=lambda x: -x[1])[:top]:
+        lines.append(f"  {size:>6}  {fileName}")
+    return lines
+
+
+class Assembler:
+    """Two-pass Hack assembler
+
+    The symbol table is copied from `symbol.py` on every run,
+    so a single process can assemble any number of programs.
 
+    Args:
+        spillThreshold (`int`): buffer size in bytes above which the
+            tagged instructions are spilled to a temporary file,
+            `None` keeps them in memory
+        optimize (`bool`): run the peephole pass before resolving labels
+        romBudget (`int`): most words the program may take
+        ramBudget (`int`): most variables that may be allocated from 16
+    """
 
-# convert A instructions: either @tmp or @TEMP or @21
-def convertA(line):
-    """Convert A instruction into binary or add variable
+    def __init__(
+        self, spillThreshold=None, optimize=False, romBudget=ROM_SIZE, ramBudget=RAM_BUDGET
+    ):
+        self.spillThreshold = spillThreshold
+        self.optimize = optimize
+        self.romBudget = romBudget
+        self.ramBudget = ramBudget
+        self.table = {}
+        self.variableIndex = VARIABLE_BASE
+        self.romSize = 0
+        self.originalSize = 0  # before the peephole pass
+        self.labels = {}  # label => ROM address
+        self.variables = {}  # variable => RAM address
+        self.lineNums = array("I")  # ROM address => source line
+
+    def assemble(self, source):
+        """Assemble Hack assembly
+
+        Args:
+            source (iterable of `str`): lines, e.g. an open `.asm` file
+
+        Returns:
+            `words` as 16-bit integers in an `array('H')`
+        """
+        # fresh symbols for every run
+        self.table = dict(Symbol.table)
+        self.variableIndex = VARIABLE_BASE
+        self.labels = {}
+        self.variables = {}
+        self.lineNums = array("I")
+
+        buffer = self.firstPass(source)
+        if self.romSize > self.romBudget:  # fail before the second pass
+            buffer.close()
+            over = self.romSize - self.romBudget
+            lines = [f"ROM overflow: {self.romSize} words, budget {self.romBudget} ({over} over)"]
+            raise ValueError("\n".join(lines + sizeBreakdown(self.labels, self.romSize)))
+        words = array("H")
+        for record in buffer:  # kind tag, then word or symbol
+            if record[0] == lexer.SYMBOL:
+                words.append(self.resolve(record[1:-1]))
+            else:
+                words.append(int(record[1:]))
+        buffer.close()  # spilled temp file is removed on close
+        return words
+
+    # add variables and return address
+    def addVariable(self, label):
+        """Add a label to the table
+
+        Args:
+            label (`str`)
+
+        Returns:
+            `address` of new label
+        """
+        if self.variableIndex - VARIABLE_BASE >= self.ramBudget:
+            raise ValueError(
+                f"RAM overflow: variable '{label}' would be at {self.variableIndex},"
+                f" budget {self.ramBudget} variables from {VARIABLE_BASE}"
+            )
+        self.table[label] = self.variableIndex
+        self.variables[label] = self.variableIndex
+        self.variableIndex += 1  # increase index for next var
+        return self.table[label]
+
+    # resolve A instructions: either @tmp or @TEMP or @LOOP
+    def resolve(self, symbol):
+        """Find address in Symbol table or add variable
+
+        Args:
+            symbol (`str`)
+
+        Returns:
+            `word` holding the address
+        """
+        address = self.table.get(symbol)
+        if address is None:  # if NOT found
+            address = self.addVariable(symbol)  # add variable
+        if address > lexer.MAX_CONSTANT:  # bit 15 would make it a C instruction
+            raise ValueError(
+                f"address {address} of '{symbol}' does not fit in 15 bits"
+                f" (max {lexer.MAX_CONSTANT})"
+            )
+        return address
+
+    # First Pass: check symbols only
+    def firstPass(self, source):
+        """Tokenize assembly codes and register labels
+
+        Args:
+            source (iterable of `str`)
+
+        Returns:
+            `buffer` of tagged instructions, rewound for the second pass
+        """
+        if self.spillThreshold is None:  # keep everything in memory
+            buffer = io.StringIO()
+        else:  # in memory until spillThreshold, then on disk
+            buffer = tempfile.SpooledTemporaryFile(
+                max_size=self.spillThreshold, mode="w+"
+            )
+
+        tokens = lexer.tokenize(source)
+        if self.optimize:  # rewrite before labels get addresses
+            tokens, self.originalSize = peephole.optimize(tokens)
+
+        line_num = 0
+        for kind, value, lineNum, _ in tokens:
+            if kind == lexer.LABEL:  # (TEST) => TEST
+                self.table[value] = line_num  # set the line number to table
+                self.labels[value] = line_num
+                continue  # move on to the next line
+            line_num += 1  # increse line num only
+            self.lineNums.append(lineNum)
+            if kind == lexer.SYMBOL:  # resolved in the second pass
+                buffer.write(lexer.SYMBOL + value + "\n")
+            else:  # numbers and C instructions are already words
+                buffer.write(lexer.NUMBER + str(value) + "\n")
+        self.romSize = line_num
+        if not self.optimize:
+            self.originalSize = line_num
+        buffer.seek(0)  # rewind for the second pass
+        return buffer
+
+
+def writeText(words, writeFile):
+    """Write classic `.hack` text, one 16-digit binary word per line"""
+    writeFile.write("".join([format(word, "016b") + "\n" for word in words]))
+
+
+def writeBinary(words, writeFile):
+    """Write a raw little-endian ROM image with a single `tofile()`"""
+    if sys.byteorder == "big":  # array stores words in native order
+        words = array("H", words)
+        words.byteswap()
+    words.tofile(writeFile)
+
+
+def writeListing(words, lineNums, sourceLines, writeFile):
+    """Write `.lst`: ROM address, source line, word and source text"""
+    rows = ["// ROM   line  word              source\n"]
+    for address, word in enumerate(words):
+        lineNum = lineNums[address]
+        text = sourceLines[lineNum - 1].strip()
+        rows.append(f"{address:05d}  {lineNum:5d}  {word:016b}  {text}\n")
+    writeFile.write("".join(rows))
+
+
+def writeSymbols(assembler, writeFile):
+    """Write `.sym` JSON of label ROM addresses and variable RAM addresses"""
+    json.dump(
+        {"labels": assembler.labels, "variables": assembler.variables},
+        writeFile,
+        indent=2,
+    )
+    writeFile.write("\n")
+
+
+def assembleFile(
+    path,
+    spillThreshold=None,
+    binary=False,
+    listing=False,
+    symbols=False,
+    optimize=False,
+    romBudget=ROM_SIZE,
+    ramBudget=RAM_BUDGET,
+):
+    """Assemble `Prog.asm` into `Prog.hack` (or `Prog.bin`) in one bulk write
 
     Args:
-        line (`str`)
+        listing (`bool`): also write `Prog.lst`
+        symbols (`bool`): also write `Prog.sym`
+        optimize (`bool`): run the peephole pass
+        romBudget, ramBudget (`int`): see `Assembler`
 
     Returns:
-        `binary code`
+        `Assembler` used for the run
     """
-    if line[1].isalpha():  # @temp or @R0
-        removeSigns = re.search(r"[^\@\ ]+", line)
-        var = removeSigns.group(0)  # remove parenthesis
-        # Find address in Symbol table
-        varAddress = Symbol.table.get(var, -1)
+    assembler = Assembler(spillThreshold, optimize, romBudget, ramBudget)
+    with open(path) as loadFile:
+        words = assembler.assemble(loadFile)
 
-        if varAddress == -1:  # if NOT found
-            varAddress = addVariable(var)  # add variable
+    if binary:
+        with open(outputPath(path, binary), "wb") as writeFile:
+            writeBinary(words, writeFile)
+    else:
+        with open(outputPath(path, binary), "w") as writeFile:
+            writeText(words, writeFile)
+    name = os.path.splitext(path)[0]
+    if listing:
+        with open(path) as loadFile:
+            sourceLines = loadFile.readlines()
+        with open(name + ".lst", "w") as writeFile:
+            writeListing(words, assembler.lineNums, sourceLines, writeFile)
+    if symbols:
+        with open(name + ".sym", "w") as writeFile:
+            writeSymbols(assembler, writeFile)
+    return assembler
+
+
+def assembleStream(
+    spillThreshold=None,
+    binary=False,
+    optimize=False,
+    romBudget=ROM_SIZE,
+    ramBudget=RAM_BUDGET,
+):
+    """Assemble stdin to stdout, e.g. `... | python assembler.py - | ...`
+
+    Lines are tokenized as they arrive; only the tagged first-pass buffer
+    is kept until labels are known.
 
-    else:  # convert number to binary except first digit
-        varAddress = int(line[1:])  # @3 => 3
+    Returns:
+        `Assembler` used for the run
+    """
+    assembler = Assembler(spillThreshold, optimize, romBudget, ramBudget)
+    words = assembler.assemble(sys.stdin)
+    if binary:
+        writeBinary(words, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    else:
+        writeText(words, sys.stdout)
+        sys.stdout.flush()
+    return assembler
 
-    numToBinary = bin(varAddress)[2:].zfill(16)  # 3 => 0000000000000011
-    return numToBinary
 
+def reportPeephole(name, assembler):
+    """Instruction count before and after the peephole pass, on stderr"""
+    before, after = assembler.originalSize, assembler.romSize
+    saved = (before - after) / before * 100 if before else 0
+    print(f"{name}: {before} -> {after} instructions ({saved:.1f}% fewer)", file=sys.stderr)
 
-# convert C instructions
-def convertC(line):
-    """Slice C instruction into 3 pieces
 
-    Args:
-        line (`str`)
+def reportSizes(assembler):
+    """ROM breakdown and RAM use of a finished run, on stderr"""
+    lines = sizeBreakdown(assembler.labels, assembler.romSize)
+    variables = assembler.variableIndex - VARIABLE_BASE
+    lines.append(f"variables: {variables} of {assembler.ramBudget}")
+    print("\n".join(lines), file=sys.stderr)
 
-    Returns:
-        `[comp, dest, jump]`
-    """
-    line = normalize(line)  # normalize (dest=comp;jump)
-    tmp = line.split("=")  # first dest vs rest
-    dest = Cinst.destination.get(tmp[0])
-    tmp = tmp[1].split(";")  # second comp vs jump
-    comp = Cinst.computation.get(tmp[0])
-    jump = Cinst.jump.get(tmp[1])
-    return "111" + comp + dest + jump
-
-
-def translate(line):
-    """Translate line to either A or C"""
-    line = line.rstrip()  # strip \n
-    if line[0] == "@":
-        return convertA(line)
-    else:
-        return convertC(line)
-
-
-# First Pass: check symbols only
-def firstPass():
-    """Trim assembly codes and register labels"""
-    loadFile = open(path + ".asm")
-    writeFile = open(path + ".tmp", "w")
-
-    line_num = 0
-    for li in loadFile:
-        line = trim(li)  # remove comment,whitespace
-        if len(line) > 0:  # if NOT empty line
-            if line[0] == "(":  # if LABEL
-                label = line[1:-1]  # e.g. (TEST) => TEST
-                Symbol.table[label] = line_num  # set the line number to table
-                continue  # move on to the next line
-            else:  # if NOT label,
-                line_num += 1  # increse line num only
-                writeFile.write(line + "\n")  # write the line
-    loadFile.close()
 
+def outputPath(path, binary=False):
+    return os.path.splitext(path)[0] + (".bin" if binary else ".hack")
 
-def assemble():
-    loadFile = open(path + ".tmp")
-    writeFile = open(path + ".hack", "w")
 
-    for li in loadFile:
-        line = translate(li)
-        writeFile.write(line + "\n")
+def timedAssembleFile(path, **options):
+    """Assemble one file for `assembleTree()`
 
-    loadFile.close()
-    writeFile.close()
-    # os.remove(path + ".tmp") # remove temp file
+    Returns:
+        `(path, originalSize, romSize, seconds)`
+    """
+    start = time.perf_counter()
+    assembler = assembleFile(path, **options)
+    elapsed = time.perf_counter() - start
+    return path, assembler.originalSize, assembler.romSize, elapsed
 
 
-# Change path# of file you want to assemble
-# as 'path' and this program will run with the file
-path1 = "./add/Add"
-path2 = "./max/Max"
-path3 = "./rect/Rect"
-path4 = "./pong/Pong"
+def findSources(root, binary=False, force=False):
+    """Find every `.asm` under root
 
-firstPass()
-assemble()
+    Returns:
+        `(stale, upToDate)` paths, sorted; a file is up to date when
+        its output is newer than the source
+    """
+    stale, upToDate = [], []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.endswith(".asm"):
+                continue
+            path = os.path.join(dirpath, filename)
+            output = outputPath(path, binary)
+            if (
+                not force
+                and os.path.exists(output)
+                and os.path.getmtime(output) > os.path.getmtime(path)
+            ):
+                upToDate.append(path)
+            else:
+                stale.append(path)
+    return stale, upToDate
+
+
+def assembleTree(root, jobs=None, force=False, **options):
+    """Assemble every stale `.asm` under root across a process pool
+    and print a per-file timing table
+
+    Args:
+        options: passed on to `assembleFile()`
 
-print(Symbol.table)
\ No newline at end of file
+    Returns:
+        `failed` number of files that did not assemble
+    """
+    start = time.perf_counter()
+    stale, upToDate = findSources(root, options.get("binary", False), force)
+    results, errors = [], []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            (path, pool.submit(timedAssembleFile, path, **options)) for path in stale
+        ]
+        for path, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:  # report and keep going
+                errors.append((path, e))
+    wall = time.perf_counter() - start
+
+    width = max([len(os.path.relpath(path, root)) for path in stale] + [4])
+    print(f"{'file':<{width}}  {'before':>6}  {'words':>6}  {'ms':>8}")
+    for path, originalSize, romSize, seconds in results:
+        name = os.path.relpath(path, root)
+        print(
+            f"{name:<{width}}  {originalSize:>6}  {romSize:>6}  {seconds * 1000:>8.1f}"
+        )
+    for path, e in errors:
+        print(f"{os.path.relpath(path, root):<{width}}  failed: {e}")
+    print(
+        f"{len(results)} assembled, {len(errors)} failed, "
+        f"{len(upToDate)} up to date in {wall * 1000:.1f} ms"
+    )
+    return len(errors)
+
+
+def run(args):
+    """Dispatch parsed command line arguments"""
+    budgets = dict(romBudget=args.rom_budget, ramBudget=args.ram_budget)
+    if args.path == "-":
+        assembler = assembleStream(args.spill, args.binary, args.optimize, **budgets)
+        if args.optimize:
+            reportPeephole("<stdin>", assembler)
+        if args.sizes:
+            reportSizes(assembler)
+    else:
+        options = dict(
+            spillThreshold=args.spill,
+            binary=args.binary,
+            listing=args.listing,
+            symbols=args.symbols,
+            optimize=args.optimize,
+            **budgets,
+        )
+        if os.path.isdir(args.path):
+            failed = assembleTree(args.path, args.jobs, args.force, **options)
+            sys.exit(1 if failed else 0)
+        assembler = assembleFile(args.path, **options)
+        if args.optimize:
+            reportPeephole(args.path, assembler)
+        if args.sizes:
+            reportSizes(assembler)
+
+
+# e.g. python assembler.py ./pong/Pong.asm
+#      python assembler.py --jobs 4 ..    (every .asm under a directory)
+#      python assembler.py - < Prog.asm > Prog.hack
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hack assembler")
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default="-",
+        help="Prog.asm to assemble, a directory tree, or - for stdin to stdout",
+    )
+    parser.add_argument(
+        "--binary", action="store_true", help="write a little-endian Prog.bin image"
+    )
+    parser.add_argument(
+        "--spill",
+        type=int,
+        metavar="BYTES",
+        help="spill the first pass to a temporary file above BYTES",
+    )
+    parser.add_argument(
+        "-O",
+        "--optimize",
+        action="store_true",
+        help="run the peephole pass and report instruction counts",
+    )
+    parser.add_argument(
+        "--rom-budget",
+        type=int,
+        default=ROM_SIZE,
+        metavar="WORDS",
+        help=f"fail when the program takes more ROM (default: {ROM_SIZE})",
+    )
+    parser.add_argument(
+        "--ram-budget",
+        type=int,
+        default=RAM_BUDGET,
+        metavar="WORDS",
+        help=f"fail when more variables are allocated (default: {RAM_BUDGET})",
+    )
+    parser.add_argument(
+        "--sizes",
+        action="store_true",
+        help="print the largest labels and files in ROM",
+    )
+    parser.add_argument(
+        "--listing",
+        action="store_true",
+        help="write Prog.lst mapping ROM address, source line and word",
+    )
+    parser.add_argument(
+        "--symbols",
+        action="store_true",
+        help="write Prog.sym JSON of label and variable addresses",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="worker processes for a directory (default: one per core)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="reassemble files whose output is already up to date",
+    )
+    args = parser.parse_args()
+    try:
+        run(args)
+    except ValueError as e:  # malformed input or over budget
+        sys.exit(f"error: {e}")
@@ -0,0 +1,42 @@
+import timeit
+import sys
+
+import assembler
+import lexer
+import c_instruction as Cinst
+
+# e.g. python benchmark.py ./pong/Pong.asm
+path = sys.argv[1] if len(sys.argv) > 1 else "./pong/Pong.asm"
+repeat = 5
+
+
+def cInstructions(path):
+    """Trimmed C instructions of a program, in source order"""
+    with open(path) as loadFile:
+        lines = ["".join(li.split("//")[0].split()) for li in loadFile]
+    return [line for line in lines if line and line[0] not in "@("]
+
+
+def sliceEveryTime(line):
+    """Encode without `Cinst.encoding`, as convertC() used to"""
+    (dest, _), (comp, _), (jmp, _) = lexer.sliceC(line)
+    bits = Cinst.computation[comp] + Cinst.destination[dest] + Cinst.jump[jmp]
+    return int("111" + bits, 2)
+
+
+def best(statement):
+    """Best wall time of `repeat` runs in milliseconds"""
+    return min(timeit.repeat(statement, number=1, repeat=repeat)) * 1000
+
+
+lines = cInstructions(path)
+sliced = best(lambda: [sliceEveryTime(line) for line in lines])
+cached = best(lambda: [lexer.encodeC(line) for line in lines])
+print(f"{path}: {len(lines)} C instructions")
+print(f"  slice every time : {sliced:8.2f} ms")
+print(f"  encoding cache   : {cached:8.2f} ms ({sliced / cached:.1f}x)")
+
+with open(path) as loadFile:
+    source = loadFile.readlines()
+whole = best(lambda: assembler.Assembler().assemble(source))
+print(f"  whole program    : {whole:8.2f} ms")
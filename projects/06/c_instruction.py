@@ -28,6 +28,13 @@ computation = {
     "M-D": "1000111",
     "D&M": "1000000",
     "D|M": "1010101",
+    # commutative spellings, e.g. M=M+D from the VM translator
+    "A+D": "0000010",
+    "A&D": "0000000",
+    "A|D": "0010101",
+    "M+D": "1000010",
+    "M&D": "1000000",
+    "M|D": "1010101",
 }
 
 
@@ -52,4 +59,20 @@ jump = {
     "JNE": "101",
     "JLE": "110",
     "JMP": "111",
-}
\ No newline at end of file
+}
+
+# every legal C instruction as written in assembly (e.g. M=D, D;JGT, AM=M-1)
+# mapped to its 16-bit word, so encoding is a single dict lookup
+def buildEncoding():
+    encoding = {}
+    for dest, destBits in destination.items():
+        for comp, compBits in computation.items():
+            for jmp, jumpBits in jump.items():
+                line = comp if dest == "null" else dest + "=" + comp
+                if jmp != "null":
+                    line += ";" + jmp
+                encoding[line] = int("111" + compBits + destBits + jumpBits, 2)
+    return encoding
+
+
+encoding = buildEncoding()
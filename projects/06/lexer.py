@@ -0,0 +1,149 @@
+import c_instruction as Cinst
+import string
+
+# kind of every line, decided once by tokenize()
+LABEL = "L"  # (LOOP)
+NUMBER = "N"  # @21
+SYMBOL = "S"  # @LOOP, @i, @R0
+COMMAND = "C"  # dest=comp;jump
+
+# A instructions load 15-bit constants, the top bit marks C instructions
+MAX_CONSTANT = 32767
+
+# letters, digits and _ . $ : (symbols may not start with a digit)
+SYMBOL_CHARS = frozenset(string.ascii_letters + string.digits + "_.$:")
+
+# lookup tables in the order sliceC() returns pieces
+TABLES = [
+    ("destination", Cinst.destination),
+    ("computation", Cinst.computation),
+    ("jump", Cinst.jump),
+]
+
+
+def isSymbol(name):
+    return bool(name) and not name[0].isdigit() and SYMBOL_CHARS.issuperset(name)
+
+
+# slice C instruction as (dest = comp ; jump)
+def sliceC(line):
+    """Slice C instruction into 3 pieces
+
+    Args:
+        line (`str`)
+
+    Returns:
+        `[(dest, offset), (comp, offset), (jump, offset)]`
+    """
+    semi = line.find(";")
+    if semi == -1:  # e.g. D=M => D=M;null
+        semi = len(line)
+        jmp = "null"
+    else:
+        jmp = line[semi + 1 :]
+    eq = line.find("=", 0, semi)
+    dest = line[:eq] if eq != -1 else "null"  # e.g. D;JMP => null=D;JMP
+    return [(dest, 0), (line[eq + 1 : semi], eq + 1), (jmp, semi + 1)]
+
+
+def encodeC(line):
+    """Encode C instruction with one lookup in `Cinst.encoding`
+
+    Spellings missing from the table (e.g. `null=D;null`) are sliced once
+    and memoized under their own text.
+
+    Args:
+        line (`str`)
+
+    Returns:
+        `word`, or `None` if a piece is unknown
+    """
+    code = Cinst.encoding.get(line)
+    if code is None:  # not pre-seeded, slice and remember
+        pieces = sliceC(line)
+        bits = [table.get(piece) for (piece, _), (_, table) in zip(pieces, TABLES)]
+        if None in bits:
+            return None
+        dest, comp, jmp = bits
+        code = int("111" + comp + dest + jmp, 2)
+        Cinst.encoding[line] = code
+    return code
+
+
+def columnOf(line, offset):
+    """1-based column in `line` of character `offset` of its text with
+    whitespace removed, or just past the text if there is no such character
+    """
+    for index, char in enumerate(line):
+        if not char.isspace():
+            if not offset:
+                return index + 1
+            offset -= 1
+    return len(line.rstrip()) + 1
+
+
+def error(name, lineNum, column, message):
+    return ValueError(f"{name}:{lineNum}:{column}: {message}")
+
+
+def tokenize(source):
+    """Classify every line of Hack assembly once
+
+    Comments and blank lines are dropped, numbers are parsed and
+    C instructions are encoded here, so the second pass only has to
+    resolve symbols.
+
+    Args:
+        source (iterable of `str`): lines, e.g. an open `.asm` file
+
+    Yields:
+        `(kind, value, lineNum, column)` where value is the label or symbol
+        name for `LABEL`/`SYMBOL` and the word for `NUMBER`/`COMMAND`
+
+    Raises:
+        `ValueError` as `name:line:column: message` on malformed input
+    """
+    name = getattr(source, "name", "<source>")
+    for lineNum, line in enumerate(source, 1):
+        commentIndex = line.find("//")
+        if commentIndex != -1:  # drop comment, keep code before it
+            line = line[:commentIndex]
+        text = line.strip()
+        if not text:  # blank or comment only
+            continue
+        column = len(line) - len(line.lstrip()) + 1
+        if " " in text or "\t" in text:  # e.g. D = M ; JGT
+            text = "".join(text.split())
+
+        first = text[0]
+        if first == "@":
+            value = text[1:]
+            if value.isdecimal():  # @21
+                number = int(value)
+                if number > MAX_CONSTANT:
+                    raise error(
+                        name, lineNum, column, f"constant {value} exceeds {MAX_CONSTANT}"
+                    )
+                yield NUMBER, number, lineNum, column
+            elif isSymbol(value):  # @LOOP
+                yield SYMBOL, value, lineNum, column
+            else:
+                raise error(name, lineNum, column, f"invalid A-instruction '{text}'")
+        elif first == "(":
+            label = text[1:-1]
+            if text[-1] != ")" or not isSymbol(label):
+                raise error(name, lineNum, column, f"invalid label '{text}'")
+            yield LABEL, label, lineNum, column
+        else:
+            code = encodeC(text)
+            if code is None:  # point at the first unknown piece
+                for (piece, offset), (part, table) in zip(sliceC(text), TABLES):
+                    if piece not in table:
+                        # offsets count characters of the squeezed text
+                        raise error(
+                            name,
+                            lineNum,
+                            columnOf(line, offset),
+                            f"unknown {part} '{piece}'",
+                        )
+            yield COMMAND, code, lineNum, column
@@ -0,0 +1,142 @@
+import c_instruction as Cinst
+import lexer
+
+# dest bit that writes A, and the jump bits (see c_instruction.py)
+DEST_A = 0b100000
+JUMP = 0b111
+
+
+def token(line):
+    """`(kind, value)` of one instruction as the lexer would classify it"""
+    if line[0] == "@":
+        return (lexer.SYMBOL, line[1:])
+    return (lexer.COMMAND, Cinst.encoding[line])
+
+
+def rule(pattern, replacement, deadA=False):
+    """Rewrite `pattern` into `replacement` when it ends a basic block's tail
+
+    Args:
+        deadA (`bool`): the replacement leaves a different value in A,
+            so it only applies when the next instruction loads A
+    """
+    return (
+        [token(line) for line in pattern],
+        [token(line) for line in replacement],
+        deadA,
+    )
+
+
+# every rewrite leaves D, memory and (unless deadA) A as the pattern did
+RULES = [
+    # pop:       SP--, A=*SP          (@SP is reloaded by redundantReload())
+    rule(["@SP", "M=M-1", "A=M"], ["@SP", "AM=M-1"]),
+    # push then pop
+    rule(["@SP", "M=M+1", "M=M-1"], ["@SP"]),
+    rule(["@SP", "M=M+1", "AM=M-1"], ["@SP", "A=M"]),
+    # push:      *SP=D, SP++
+    rule(
+        ["@SP", "A=M", "M=D", "@SP", "M=M+1"],
+        ["@SP", "AM=M+1", "A=A-1", "M=D"],
+        deadA=True,
+    ),
+]
+
+
+def isAInstruction(kind):
+    return kind == lexer.NUMBER or kind == lexer.SYMBOL
+
+
+def redundantReload(out, start):
+    """`@X, c, @X` where c neither writes A nor jumps: the second @X is a no-op"""
+    if len(out) - start < 3:
+        return False
+    first, middle, last = out[-3], out[-2], out[-1]
+    return (
+        isAInstruction(last[0])
+        and first[:2] == last[:2]
+        and middle[0] == lexer.COMMAND
+        and not middle[1] & (DEST_A | JUMP)
+    )
+
+
+def matches(out, start, pattern):
+    """pattern matches the tail of out without crossing `start` (a label)"""
+    size = len(pattern)
+    if len(out) - start < size:
+        return False
+    tail = out[-size:]
+    for tok, (kind, value) in zip(tail, pattern):
+        if tok[0] != kind or tok[1] != value:
+            return False
+    return True
+
+
+def rewrite(out, start, lookahead):
+    """Apply rules to the tail of out until none matches
+
+    Args:
+        lookahead (`str`): kind of the next instruction, or `None`
+    """
+    changed = True
+    while changed:
+        changed = False
+        if redundantReload(out, start):
+            out.pop()
+            changed = True
+            continue
+        for pattern, replacement, deadA in RULES:
+            if deadA and not isAInstruction(lookahead):
+                continue
+            if matches(out, start, pattern):
+                # replacement keeps the source position of the pattern
+                lineNum, column = out[-len(pattern)][2:]
+                del out[-len(pattern) :]
+                out.extend(
+                    [(kind, value, lineNum, column) for kind, value in replacement]
+                )
+                changed = True
+                break
+
+
+def jumpsToNumber(tokens):
+    """`@21` followed by a jump: a target no label keeps up to date"""
+    previous = None
+    for kind, value, *_ in tokens:
+        if kind == lexer.COMMAND and value & JUMP and previous == lexer.NUMBER:
+            return True
+        if kind != lexer.LABEL:
+            previous = kind
+    return False
+
+
+def optimize(tokens):
+    """Peephole pass over `lexer.tokenize()` output
+
+    Labels split the program into basic blocks and no pattern spans one,
+    so jumps into the middle of a rewrite cannot happen. Labels stay in
+    the stream and get their (new) addresses in the first pass.
+
+    Programs that jump to numeric addresses (e.g. `RectL.asm`) are left as
+    they are: every rewrite would move the instructions those jump to.
+
+    Returns:
+        `(tokens, count)` rewritten tokens and the instruction count before
+    """
+    tokens = list(tokens)
+    count = sum(1 for tok in tokens if tok[0] != lexer.LABEL)
+    if jumpsToNumber(tokens):
+        return tokens, count
+    out = []
+    start = 0  # first token of the current basic block
+    for tok in tokens:
+        kind = tok[0]
+        if kind == lexer.LABEL:
+            rewrite(out, start, None)  # A is live across a label
+            out.append(tok)
+            start = len(out)
+            continue
+        rewrite(out, start, kind)
+        out.append(tok)
+    rewrite(out, start, None)
+    return out, count
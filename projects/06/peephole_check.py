@@ -0,0 +1,95 @@
+import sys
+
+import assembler
+
+# e.g. python peephole_check.py        (every sample program, with and without -O)
+programs = [
+    "add/Add.asm",
+    "max/Max.asm",
+    "max/MaxL.asm",
+    "rect/Rect.asm",
+    "rect/RectL.asm",
+    "pong/Pong.asm",
+    "pong/PongL.asm",
+]
+ram = {0: 5, 1: 3}  # R0, R1: inputs of Max and Rect
+cycles = 5_000_000  # Pong draws its first few thousand screen words
+SCREEN = 16384
+MASK = 0xFFFF
+
+
+def run(words):
+    """Run a Hack program on a minimal CPU
+
+    Returns:
+        `(ram, screenWrites, halted)` when it halts (jumps to itself) or
+        after `cycles`, screen writes as `(address, value)` in order
+    """
+    memory = [0] * 65536  # A can hold any 16-bit value once a program goes wrong
+    for address, value in ram.items():
+        memory[address] = value
+    screenWrites = []
+    a = d = pc = 0
+    for _ in range(cycles):
+        if pc >= len(words):
+            return memory, screenWrites, True
+        word = words[pc]
+        if not word & 0x8000:  # A instruction
+            a = word
+            pc += 1
+            continue
+        y = memory[a] if word & 0x1000 else a
+        x = d
+        if word & 0x800:  # zx, nx, zy, ny, f, no
+            x = 0
+        if word & 0x400:
+            x = ~x & MASK
+        if word & 0x200:
+            y = 0
+        if word & 0x100:
+            y = ~y & MASK
+        out = (x + y) & MASK if word & 0x80 else x & y
+        if word & 0x40:
+            out = ~out & MASK
+        if word & 0x8:  # dest M, with the old A
+            memory[a] = out
+            if a >= SCREEN:
+                screenWrites.append((a, out))
+        if word & 0x10:
+            d = out
+        target = a
+        if word & 0x20:
+            a = out
+        signed = out - 0x10000 if out & 0x8000 else out
+        jump = word & 0x7
+        if (
+            (jump & 4 and signed < 0)
+            or (jump & 2 and signed == 0)
+            or (jump & 1 and signed > 0)
+        ):
+            if target == pc - 1 or target == pc:  # @HALT 0;JMP
+                return memory, screenWrites, True
+            pc = target
+        else:
+            pc += 1
+    return memory, screenWrites, False
+
+
+failed = 0
+for path in programs:
+    plain = assembler.Assembler().assemble(open(path))
+    optimized = assembler.Assembler(optimize=True).assemble(open(path))
+    plainRam, plainScreen, halted = run(plain)
+    optimizedRam, optimizedScreen, optimizedHalted = run(optimized)
+    # the optimized program may get further in the same number of cycles
+    shown = min(len(plainScreen), len(optimizedScreen))
+    same = plainScreen[:shown] == optimizedScreen[:shown]
+    if halted or optimizedHalted:  # compare the whole state too
+        same = same and halted == optimizedHalted and plainRam == optimizedRam
+    same = same and bool(plainScreen) == bool(optimizedScreen)
+    failed += not same
+    print(
+        f"{path:<16} {len(plain):>6} -> {len(optimized):>6} words,"
+        f" {shown:>6} screen writes {'same' if same else 'DIFFERENT'}"
+    )
+sys.exit(1 if failed else 0)
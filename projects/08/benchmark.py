@@ -0,0 +1,79 @@
+import glob
+import os
+import tempfile
+import timeit
+
+from vm_translator import CodeWriter, read_commands
+
+# e.g. python benchmark.py        (08 tests and 11 programs with the OS)
+root = os.path.dirname(os.path.abspath(__file__))
+repeat = 5
+
+
+class LineWriter(CodeWriter):
+    """one `asm.write()` per instruction, as `write()` used to"""
+
+    def write(self, command):
+        if command[0] not in "/(":  # not a comment or label
+            self.instruction_count += 1
+        self.asm.write(command + "\n")
+
+    def write_block(self, block):
+        if block[0]:
+            for line in block[0].split("\n"):
+                self.write(line)
+
+    def write_cached(self, key, write_lines):
+        write_lines()
+
+
+def programs():
+    """`[(vm_file, commands)]` of every program, OS files added to 11"""
+    os_files = sorted(glob.glob(f"{root}/../../tools/OS/*.vm"))
+    found = []
+    for directory in sorted(glob.glob(f"{root}/*/*")):
+        found.append(sorted(glob.glob(f"{directory}/*.vm")))
+    for directory in sorted(glob.glob(f"{root}/../11/*")):
+        vm_files = sorted(glob.glob(f"{directory}/*.vm"))
+        names = {os.path.basename(vm_file) for vm_file in vm_files}
+        vm_files += [f for f in os_files if os.path.basename(f) not in names]
+        found.append(vm_files)
+    return [
+        [(vm_file, read_commands(vm_file)) for vm_file in vm_files]
+        for vm_files in found
+        if vm_files
+    ]
+
+
+def translate(writer_class, programs, compact):
+    """write every program to a real file, return the instruction count"""
+    count = 0
+    for files in programs:
+        with tempfile.TemporaryFile("w") as asm:
+            cw = writer_class(asm, compact)
+            for vm_file, commands in files:
+                cw.set_file_name(vm_file)
+                for command_type, arg1, arg2 in commands:
+                    cw.write_command(command_type, arg1, arg2)
+            cw.flush()
+            count += cw.instruction_count
+    return count
+
+
+def best(statement):
+    """Best wall time of `repeat` runs in milliseconds"""
+    return min(timeit.repeat(statement, number=1, repeat=repeat)) * 1000
+
+
+programs = programs()
+commands = sum(len(c) for files in programs for _, c in files)
+print(f"{len(programs)} programs, {commands} VM commands")
+for compact in [False, True]:
+    count = translate(CodeWriter, programs, compact)
+    lines = best(lambda: translate(LineWriter, programs, compact))
+    batched = best(lambda: translate(CodeWriter, programs, compact))
+    mode = "compact" if compact else "inline"
+    print(f"{mode}: {count} instructions")
+    print(f"  write per line : {lines:8.2f} ms")
+    print(f"  batched blocks : {batched:8.2f} ms ({lines / batched:.1f}x)")
+    print(f"  throughput     : {count / batched:8.0f} instructions/ms")
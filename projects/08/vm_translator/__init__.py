@@ -0,0 +1,26 @@
+"""Hack VM translator (projects 07 and 08)
+
+    >>> from vm_translator import translate
+    >>> asm = translate(["Main.vm", "Sys.vm"], compact=True)
+"""
+from .cache import FragmentCache
+from .code_writer import CodeWriter
+from .parser import Parser
+from .translator import (
+    Translator,
+    find_vm_files,
+    read_commands,
+    translate,
+    translate_file,
+)
+
+__all__ = [
+    "CodeWriter",
+    "FragmentCache",
+    "Parser",
+    "Translator",
+    "find_vm_files",
+    "read_commands",
+    "translate",
+    "translate_file",
+]
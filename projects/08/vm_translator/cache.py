@@ -0,0 +1,98 @@
+import glob
+import hashlib
+import json
+import os
+
+# this package, its source is part of every key
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# translated fragments by content hash, least recently used dropped first
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "nand2tetris-vm")
+CACHE_LIMIT = 32 * 1024 * 1024  # bytes
+
+
+# ANCHOR FragmentCache
+class FragmentCache:
+    """`translate_file()` fragments on disk, one JSON file per key
+    - the key hashes the VM text (or optimized commands), the file name
+      (statics and labels use it), `compact` and the translator source
+    - a hit touches the entry, `prune()` drops the oldest beyond `limit`
+
+    @param `directory` created on first write
+    @param `limit` size cap in bytes
+    """
+
+    def __init__(self, directory=CACHE_DIR, limit=CACHE_LIMIT):
+        self.directory = directory
+        self.limit = limit
+        self.version = self.translator_version()
+        self.hits = 0
+
+    def translator_version(self):
+        """hash of the package source, new code never reads old output"""
+        digest = hashlib.sha256()
+        for module in sorted(glob.glob(os.path.join(PACKAGE_DIR, "*.py"))):
+            with open(module, "rb") as source:
+                digest.update(source.read())
+        return digest.hexdigest()
+
+    def key(self, vm_file, commands, compact):
+        digest = hashlib.sha256()
+        digest.update(self.version.encode())
+        digest.update(f"{os.path.basename(vm_file)}|{compact}|".encode())
+        if commands is None:
+            with open(vm_file, "rb") as vm:
+                digest.update(vm.read())
+        else:  # optimized, depends on the other files too
+            digest.update(repr(commands).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """fragment or `None`, a broken entry counts as a miss"""
+        path = self.path(key)
+        try:
+            with open(path) as entry:
+                cached = json.load(entry)
+            os.utime(path)  # most recently used
+        except (OSError, ValueError):
+            return None
+        self.hits += 1
+        return cached["asm"], set(cached["routines"]), cached["instructions"]
+
+    def put(self, key, fragment):
+        """write atomically, a full disk only costs the next run time"""
+        asm, routines_used, instruction_count = fragment
+        entry = {
+            "asm": asm,
+            "routines": sorted(routines_used),
+            "instructions": instruction_count,
+        }
+        path = self.path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{path}.{os.getpid()}", "w") as temp:
+                json.dump(entry, temp)
+            os.replace(f"{path}.{os.getpid()}", path)
+        except OSError:
+            pass
+
+    def prune(self):
+        """delete least recently used entries until the cache fits `limit`"""
+        entries = []
+        try:
+            for entry in os.scandir(self.directory):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        entries.sort(reverse=True)
+        total = 0
+        for _, size, path in entries:  # newest first
+            total += size
+            if total > self.limit:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,653 @@
+from . import optimizer
+
+# labels of shared routines, `$` first so no `file$label` can clash
+CALL_ROUTINE = "$CALL"
+RETURN_ROUTINE = "$RETURN"
+END_LOOP = "$END"
+# namespace of the bootstrap's labels, no `.vm` file can have this name
+BOOTSTRAP = "$bootstrap"
+COMPARE_ROUTINES = {"eq": "$EQ", "gt": "$GT", "lt": "$LT"}
+
+# jump taken when x `op` y holds, for x - y of same-sign operands
+COMPARE_JUMPS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+
+# VM keyword of each command type, for comments
+COMMAND_NAMES = {
+    "C_PUSH": "push",
+    "C_POP": "pop",
+    "C_LABEL": "label",
+    "C_GOTO": "goto",
+    "C_IF": "if-goto",
+    "C_FUNCTION": "function",
+    "C_CALL": "call",
+    "C_RETURN": "return",
+}
+
+
+# ANCHOR push/pop templates
+def block(*lines):
+    """`(text, instruction_count)` of lines, joined once and written at once"""
+    count = sum(1 for line in lines if line[0] not in "/(")
+    return ("\n".join(lines), count)
+
+
+# Push from D onto top of stack: SP++, A = old SP, *A = D
+PUSH_D_LINES = ("@SP", "AM=M+1", "A=A-1", "M=D")
+PUSH_D = block(*PUSH_D_LINES)
+# Pop from top of stack onto D: SP--, A = current stack pointer, D = *A
+POP_D_LINES = ("@SP", "AM=M-1", "D=M")
+POP_D = block(*POP_D_LINES)
+
+# base address held in a register
+BASES = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
+# segments at a fixed place: pointer 0 = 3+0 = 3 == THIS, temp = R5-R12
+REGISTERS = {"pointer": 3, "temp": 5}
+
+
+def constant_template(value):
+    """D = value, constants may be negative after folding"""
+    if value in (-1, 0, 1):
+        load = (f"D={value}",)
+    elif value < 0:  # !(~value) == value, ~value is in 0..32767
+        load = (f"@{~value}", "D=!A")
+    else:
+        load = (f"@{value}", "D=A")
+    return (load, None, None)
+
+
+def fixed_template(symbol):
+    """`static`, `pointer` and `temp` are one A-instruction away"""
+    return ((f"@{symbol}", "D=M"), (), (f"@{symbol}", "M=D"))
+
+
+def based_template(base, index):
+    """`local`, `argument`, `this`, `that`: the cheapest of
+    - stepping A from the base: `A=M`, `A=M+1`, then `A=A+1`...
+    - adding the index: `D=M`, `@i`, `A=D+A`, which clobbers D, so a
+      store computes the address into R13 before the value is popped
+    """
+    steps = ("A=M",) if index == 0 else ("A=M+1",) + ("A=A+1",) * (index - 1)
+    stepped_load = (f"@{base}",) + steps + ("D=M",)
+    added_load = (f"@{base}", "D=M", f"@{index}", "A=D+A", "D=M")
+    stepped_store = ((), (f"@{base}",) + steps + ("M=D",))
+    added_store = (
+        (f"@{base}", "D=M", f"@{index}", "D=D+A", "@R13", "M=D"),
+        ("@R13", "A=M", "M=D"),
+    )
+    load = min(added_load, stepped_load, key=len)
+    before, after = min(added_store, stepped_store, key=lambda s: len(s[0] + s[1]))
+    return (load, before, after)
+
+
+def build_template(segment, index, file_name):
+    """`(load, before, after, push, pop)` Hack blocks for `segment index`
+    - `load` leaves the value in D
+    - `before` runs ahead of the pop, `after` stores D (`None` if read-only)
+    - `push` and `pop` are the whole commands, joined once
+    """
+    if segment == "constant":
+        lines = constant_template(index)
+    elif segment == "static":
+        lines = fixed_template(f"{file_name}.{index}")  # Foo.i
+    elif segment in REGISTERS:
+        lines = fixed_template(f"R{REGISTERS[segment] + index}")
+    elif segment in BASES:
+        lines = based_template(BASES[segment], index)
+    else:
+        return None
+    load, before, after = lines
+    push = block(*load, *PUSH_D_LINES)
+    if after is None:
+        return (block(*load), None, None, push, None)
+    pop = block(*before, *POP_D_LINES, *after)
+    return (block(*load), block(*before), block(*after), push, pop)
+
+
+# common indices built once, `static` and the rest on first use
+TEMPLATES = {
+    **{("pointer", i): build_template("pointer", i, None) for i in range(2)},
+    **{("temp", i): build_template("temp", i, None) for i in range(8)},
+    **{
+        (segment, i): build_template(segment, i, None)
+        for segment in BASES
+        for i in range(16)
+    },
+    **{("constant", i): build_template("constant", i, None) for i in range(-1, 256)},
+}
+
+
+# ANCHOR
+class CodeWriter:
+    """write Hack assembly for VM commands
+
+    @param `asm` stream to write to, e.g. an open `.asm` or `io.StringIO`
+    @param `compact` route every `call` and `return` through one shared
+    routine instead of inlining the frame handling at each site
+    """
+
+    def __init__(self, asm, compact=False):
+        self.asm = asm
+        self.lines = []  # written to `asm` by flush(), once per function
+        self.blocks = {}  # write_cached() output by key
+        self.templates = dict(TEMPLATES)  # `static` added per file
+        self.compact = compact
+        self.routines_used = set()  # shared routines emitted on close
+        # variables for unique address, counters are per file
+        self.curr_file = None  # for `Foo.i` format
+        self.curr_function = None  # for `Foo.bar$label` format
+        self.bool_count = 0  # `Foo$BOOL.i`
+        self.call_count = 0  # `Foo.bar$ret.i`
+        self.instruction_count = 0  # labels and comments excluded
+
+    # ANCHOR API
+    def write_init(self):
+        self.curr_file = BOOTSTRAP
+        self.write("// Bootstrap code")
+        self.write("@256")
+        self.write("D=A")
+        self.write("@SP")
+        self.write("M=D")
+        self.write("// call Sys.init")
+        self.write_call("Sys.init", 0)
+        # self.write('@Sys.init')
+        # self.write('0;JMP')
+
+    # NOTE it should be executed before start writing a new file
+    # to give distinctive label
+    def set_file_name(self, vm_filename):
+        """distinctive label
+        - `if-goto`, `goto`, `label`,
+        - `static`: Foo.i
+        """
+        # get current file name
+        self.curr_file = vm_filename.replace(".vm", "").split("/")[-1]
+        self.curr_function = None
+        self.templates = dict(TEMPLATES)
+        self.bool_count = 0
+        self.call_count = 0
+        # comment the file name on every start
+        self.write(f"// Translate {self.curr_file}.vm")
+
+    def write_arithmetic(self, operation):
+        """Apply operation to top of stack"""
+        if operation in ["eq", "gt", "lt"]:
+            self.write_comparison(operation)
+        else:
+            self.write_cached(operation, lambda: self.write_operator(operation))
+
+    def write_operator(self, operation):
+        if operation not in ["neg", "not"]:  # Binary operator
+            self.pop_stack_to_D()  # SP--, D=*SP(n-1) (prev value)
+
+        self.decrement_SP()  # SP--
+        self.set_A_to_stack()  # A=*SP(n-2) (prev-prev value) => M
+        # NOTE at this point, if not 'neg' or 'not' operation,
+        # D holds X2 value address
+        # A holds X1 value address (refer to M(right-side) below)
+        # now you have 2 values to
+        if operation == "add":  # Arithmetic operators
+            self.write("M=M+D")
+        elif operation == "sub":
+            self.write("M=M-D")
+        elif operation == "and":
+            self.write("M=M&D")
+        elif operation == "or":
+            self.write("M=M|D")
+        elif operation == "neg":
+            self.write("M=-M")
+        elif operation == "not":
+            self.write("M=!M")
+        else:
+            self.raise_unknown(operation)
+        self.increment_SP()
+
+    def write_push_pop(self, command, segment, index):
+        _, _, _, push, pop = self.template(segment, index)
+        # PUSH constant or *segment to SP: load D, push D
+        if command == "C_PUSH":
+            self.write_block(push)
+        # POP from SP to segment: before, SP--, D = *SP, after
+        elif command == "C_POP" and pop is not None:
+            self.write_block(pop)
+        else:
+            self.raise_unknown(f"{command} {segment}")
+
+    def write_move(self, source, target):
+        """`push source; pop target` without touching the stack"""
+        _, before, after, _, _ = self.template(*target)
+        if after is None:
+            self.raise_unknown(f"pop {target[0]}")
+        self.write_block(before)
+        self.write_block(self.template(*source)[0])
+        self.write_block(after)
+
+    def write_discard(self):
+        """drop the top of stack"""
+        self.decrement_SP()
+
+    def write_if_not(self, label):
+        """`not` + `if-goto`: jump unless the popped value is -1"""
+        self.decrement_SP()
+        self.write("A=M")
+        self.write("D=M+1")  # D = 0 iff the value is true (-1)
+        self.write(f"@{self.scoped(label)}")
+        self.write("D;JNE")
+
+    def write_label(self, label):
+        self.write(f"({self.scoped(label)})")
+
+    def write_goto(self, label):
+        self.write(f"@{self.scoped(label)}")
+        self.write("0;JMP")
+
+    def write_if(self, label):
+        self.pop_stack_to_D()  # push processed result to D
+        self.write(f"@{self.scoped(label)}")
+        self.write("D;JNE")  # if D!=0 (True=-1), JUMP to label
+        # because if D=0, it means False
+
+    def write_call(self, function_name, num_args):
+        # set return-address: callerName$ret.i
+        return_address = self.scoped(f"ret.{str(self.call_count)}")
+
+        if self.compact:
+            self.write_compact_call(function_name, num_args, return_address)
+            self.call_count += 1
+            return
+
+        # 1. push return-address
+        self.write(f"@{return_address}")
+        self.write("D=A")
+        self.push_D_to_stack()
+
+        # 2. - 4. the same for every call with `num_args`
+        self.write_cached(("call", num_args), lambda: self.write_frame(num_args))
+
+        # 5. goto function
+        self.write(f"@{function_name}")
+        self.write("0;JMP")
+
+        # 6. Declare a label for the (return_address)
+        self.write(f"({return_address})")
+
+        # increment call count
+        self.call_count += 1
+
+    def write_frame(self, num_args):
+        # 2. push LCL, ARG, THIS, THAT
+        for address in ["@LCL", "@ARG", "@THIS", "@THAT"]:
+            self.write(address)
+            self.write("D=M")
+            self.push_D_to_stack()
+
+        # 3. Reposition *ARG = *SP-n-5 = *SP-(n+5)
+        # NOTE nothing to do with SP,
+        # so this block can come after LCL=SP command block
+        self.write("@SP")
+        self.write("A=M")  # A = *SP
+        self.write("D=A")  # assign value to D
+        self.write(f"@{str(5 + num_args)}")
+        self.write("D=D-A")  # D = SP-(n+5)
+        self.write("@ARG")
+        self.write("M=D")  # *ARG = D
+
+        # 4. LCL = SP
+        self.write("@SP")
+        self.write("D=M")
+        self.write("@LCL")
+        self.write("M=D")
+
+    def write_function(self, function_name, num_locals):
+        self.flush()  # previous function
+        self.curr_function = function_name
+        self.write(f"({function_name})")
+
+        # push local variables N(number of local vars) times
+        self.write_cached(("locals", num_locals), lambda: self.write_locals(num_locals))
+
+    def write_locals(self, num_locals):
+        for i in range(num_locals):
+            self.write("D=0")  # set to 0
+            self.push_D_to_stack()
+
+    def write_return(self):
+        if self.compact:
+            self.routines_used.add(RETURN_ROUTINE)
+            self.write(f"@{RETURN_ROUTINE}")
+            self.write("0;JMP")
+        else:
+            self.write_cached("return", self.write_return_frame)
+
+    # API END
+
+    def write_compact_call(self, function_name, num_args, return_address):
+        """hand callee, nArgs and return address to the shared routine
+        - R13 = callee, R14 = nArgs + 5, D = return address
+        """
+        self.routines_used.add(CALL_ROUTINE)
+        self.write(f"@{function_name}")
+        self.write("D=A")
+        self.write("@R13")
+        self.write("M=D")  # R13 = callee
+        self.write(f"@{str(5 + num_args)}")
+        self.write("D=A")
+        self.write("@R14")
+        self.write("M=D")  # R14 = nArgs + 5
+        self.write(f"@{return_address}")
+        self.write("D=A")  # D = return address
+        self.write(f"@{CALL_ROUTINE}")
+        self.write("0;JMP")
+        self.write(f"({return_address})")
+
+    def write_comparison(self, operation):
+        """`eq`/`gt`/`lt`: pop y, replace x with -1 (true) or 0 (false)
+        - compact: jump to the shared routine, D = return address
+        - otherwise inline a `Foo$BOOL.i` block
+        """
+        label = f"{self.curr_file}$BOOL.{self.bool_count}"
+        self.bool_count += 1
+        if self.compact:
+            routine = COMPARE_ROUTINES[operation]
+            self.routines_used.add(routine)
+            self.write(f"@{label}")
+            self.write("D=A")  # D = return address
+            self.write(f"@{routine}")
+            self.write("0;JMP")
+            self.write(f"({label})")
+        else:
+            self.write_compare_body(operation, label, f"END_{label}")
+            self.write(f"(END_{label})")
+
+    def write_compare_body(self, operation, label, end_label=None):
+        """compare the top two values without overflow
+        - x - y overflows only when x and y differ in sign, in that case
+          the sign of x alone decides `gt`/`lt`
+        - `end_label` jumped to when done, `None` returns through R13
+
+        @param `label` prefix of the internal labels
+        """
+        self.pop_stack_to_D()  # SP--, D = y
+        if operation == "eq":  # x - y == 0 exactly when x == y
+            self.set_A_to_stack_top()
+            self.write("D=M-D")  # D = x - y
+        else:
+            on_x_neg = "FALSE" if operation == "gt" else "TRUE"
+            on_x_pos = "TRUE" if operation == "gt" else "FALSE"
+            self.write("@R14")
+            self.write("M=D")  # R14 = y
+            self.set_A_to_stack_top()
+            self.write("D=M")  # D = x
+            self.write(f"@{label}.XNEG")
+            self.write("D;JLT")
+            self.write("@R14")  # x >= 0
+            self.write("D=M")
+            self.write(f"@{label}.{on_x_pos}")
+            self.write("D;JLT")  # y < 0
+            self.write(f"@{label}.SAME")
+            self.write("0;JMP")
+            self.write(f"({label}.XNEG)")
+            self.write("@R14")  # x < 0
+            self.write("D=M")
+            self.write(f"@{label}.{on_x_neg}")
+            self.write("D;JGE")  # y >= 0
+            self.write(f"({label}.SAME)")  # same sign, x - y fits
+            self.write("@R14")
+            self.write("D=M")
+            self.set_A_to_stack_top()
+            self.write("D=M-D")  # D = x - y
+        self.write(f"@{label}.TRUE")
+        self.write(f"D;{COMPARE_JUMPS[operation]}")
+        self.write(f"({label}.FALSE)")
+        self.set_A_to_stack_top()
+        self.write("M=0")  # False, x = 0 (000000000000)
+        self.write_compare_exit(end_label)
+        self.write(f"({label}.TRUE)")
+        self.set_A_to_stack_top()
+        self.write("M=-1")  # True, x = -1 (111111111111)
+        if end_label is None:  # inline code falls through to its end label
+            self.write_compare_exit(end_label)
+
+    def write_compare_exit(self, end_label):
+        if end_label is None:
+            self.write("@R13")
+            self.write("A=M")
+        else:
+            self.write(f"@{end_label}")
+        self.write("0;JMP")
+
+    def write_routines(self):
+        """shared routines for compact mode
+        - emitted once after the program, behind a halt loop
+        - only the routines some command jumped to
+        """
+        self.write("// Shared routines")
+        self.write(f"({END_LOOP})")
+        self.write(f"@{END_LOOP}")
+        self.write("0;JMP")
+
+        if CALL_ROUTINE in self.routines_used:
+            self.write_call_routine()
+        if RETURN_ROUTINE in self.routines_used:
+            self.write(f"({RETURN_ROUTINE})")
+            self.write_return_frame()
+        for operation, routine in COMPARE_ROUTINES.items():
+            if routine in self.routines_used:
+                self.write(f"({routine})")
+                self.write("@R13")
+                self.write("M=D")  # R13 = return address
+                self.write_compare_body(operation, routine)
+
+    def write_call_routine(self):
+        """R13 = callee, R14 = nArgs + 5, D = return address"""
+        self.write(f"({CALL_ROUTINE})")
+        self.push_D_to_stack()  # push return-address
+        for address in ["@LCL", "@ARG", "@THIS", "@THAT"]:
+            self.write(address)
+            self.write("D=M")
+            self.push_D_to_stack()
+        self.write("@R14")
+        self.write("D=M")  # D = nArgs + 5
+        self.write("@SP")
+        self.write("D=M-D")
+        self.write("@ARG")
+        self.write("M=D")  # ARG = SP-(n+5)
+        self.write("@SP")
+        self.write("D=M")
+        self.write("@LCL")
+        self.write("M=D")  # LCL = SP
+        self.write("@R13")
+        self.write("A=M")
+        self.write("0;JMP")  # goto callee
+
+    def write_return_frame(self):
+        # Temporary variables
+        endFrame = "R13"
+        retAddr = "R14"
+
+        # endFrame = LCL
+        self.write("@LCL")
+        self.write("D=M")
+        self.write(f"@{endFrame}")
+        self.write("M=D")
+
+        # retAddr = *(endFrame-5)
+        self.write(f"@{endFrame}")
+        self.write("D=M")  # D = endFrame
+        self.write("@5")
+        self.write("D=D-A")  # D = endFrame - 5
+        self.write("A=D")  # A = endFrame - 5 (empty D)
+        self.write("D=M")  # D = *(endFrame - 5)
+        self.write(f"@{retAddr}")
+        self.write("M=D")  # retAddr = D
+
+        # *ARG = pop()
+        self.pop_stack_to_D()
+        self.write("@ARG")
+        self.write("A=M")
+        self.write("M=D")
+
+        # SP = ARG+1
+        self.write("@ARG")
+        self.write("D=M")
+        self.write("@SP")
+        self.write("M=D+1")
+
+        # THAT = *(endFrame-1)
+        # THIS = *(endFrame-2)
+        # ARG = *(endFrame-3)
+        # LCL = *(endFrame-4)
+        dist = 1
+        for address in ["@THAT", "@THIS", "@ARG", "@LCL"]:
+            self.write(f"@{endFrame}")
+            self.write("D=M")  # D = endFrame
+            self.write(f"@{str(dist)}")
+            self.write("D=D-A")  # D = endFrame - dist
+            self.write("A=D")  # A = endFrame - dist
+            self.write("D=M")  # D = *(endFrame-dist)
+            self.write(address)
+            self.write("M=D")  # Segment =  *(endFrame-dist)
+            dist += 1
+
+        # goto retAddr
+        self.write(f"@{retAddr}")
+        self.write("A=M")
+        self.write("0;JMP")
+
+    def write_command(self, command_type, arg1, arg2):
+        """write one `(command_type, arg1, arg2)` after its VM text"""
+        self.write("// " + describe(command_type, arg1, arg2))
+        if command_type in ["C_PUSH", "C_POP"]:
+            self.write_push_pop(command_type, arg1, arg2)
+        elif command_type == "C_ARITHMETIC":
+            self.write_arithmetic(arg1)
+        elif command_type == "C_LABEL":
+            self.write_label(arg1)
+        elif command_type == "C_GOTO":
+            self.write_goto(arg1)
+        elif command_type == "C_IF":
+            self.write_if(arg1)
+        elif command_type == "C_FUNCTION":
+            self.write_function(arg1, arg2)
+        elif command_type == "C_CALL":
+            self.write_call(arg1, arg2)
+        elif command_type == "C_RETURN":
+            self.write_return()
+        elif command_type == optimizer.C_MOVE:
+            self.write_move(arg1, arg2)
+        elif command_type == optimizer.C_DISCARD:
+            self.write_discard()
+        elif command_type == optimizer.C_IF_NOT:
+            self.write_if_not(arg1)
+
+    def write_fragment(self, fragment):
+        """append a `translate_file()` fragment, link its routines"""
+        asm, routines_used, instruction_count = fragment
+        self.flush()
+        self.asm.write(asm)
+        self.routines_used |= routines_used
+        self.instruction_count += instruction_count
+
+    # NOTE Core function
+    def write(self, command):
+        if command[0] not in "/(":  # not a comment or label
+            self.instruction_count += 1
+        self.lines.append(command)
+
+    def write_block(self, block):
+        """write a `block()` with one append"""
+        text, instruction_count = block
+        if text:
+            self.lines.append(text)
+            self.instruction_count += instruction_count
+
+    def write_cached(self, key, write_lines):
+        """call `write_lines()` once, then repeat its output as a block
+        - only for code that does not depend on labels or counters
+        """
+        block = self.blocks.get(key)
+        if block is None:
+            start, count = len(self.lines), self.instruction_count
+            write_lines()
+            text = "\n".join(self.lines[start:])
+            self.blocks[key] = (text, self.instruction_count - count)
+        else:
+            self.write_block(block)
+
+    def flush(self):
+        """write the buffered lines to `asm` in one call"""
+        if self.lines:
+            self.lines.append("")  # trailing newline
+            self.asm.write("\n".join(self.lines))
+            self.lines = []
+
+    def finish(self):
+        """write the shared routines and everything buffered"""
+        if self.routines_used:
+            self.write_routines()
+        self.flush()
+
+    def close(self):
+        self.finish()
+        self.asm.close()
+
+    def scoped(self, label):
+        """labels are local to a function: `Foo.bar$label`
+        - `Foo$label` for code outside any function
+        """
+        return f"{self.curr_function or self.curr_file}${label}"
+
+    def raise_unknown(self, arg):
+        raise ValueError(f"{arg} is an invalid argument")
+
+    def template(self, segment, index):
+        """cached `build_template()`"""
+        key = (segment, index)
+        template = self.templates.get(key)
+        if template is None:
+            template = build_template(segment, index, self.curr_file)
+            if template is None:
+                self.raise_unknown(segment)
+            self.templates[key] = template
+        return template
+
+    def push_D_to_stack(self):
+        """Push from D onto top of stack, increment @SP"""
+        self.write_block(PUSH_D)
+
+    def pop_stack_to_D(self):
+        """Decrement @SP, pop from top of stack onto D"""
+        self.write_block(POP_D)
+
+    def decrement_SP(self):
+        self.write("@SP")
+        self.write("M=M-1")
+
+    def increment_SP(self):
+        self.write("@SP")
+        self.write("M=M+1")
+
+    def set_A_to_stack(self):
+        self.write("@SP")
+        self.write("A=M")
+
+    def set_A_to_stack_top(self):
+        """A = address of the top value, SP unchanged"""
+        self.write("@SP")
+        self.write("A=M-1")
+
+
+def describe(command_type, arg1, arg2):
+    """VM text of a command for the `.asm` comments"""
+    if command_type == "C_ARITHMETIC":
+        return arg1
+    if command_type == optimizer.C_MOVE:
+        return "push {} {}; pop {} {}".format(*arg1, *arg2)
+    if command_type == optimizer.C_DISCARD:
+        return "pop (discard)"
+    if command_type == optimizer.C_IF_NOT:
+        return f"not; if-goto {arg1}"
+    if arg2 is not None:
+        return f"{COMMAND_NAMES[command_type]} {arg1} {arg2}"
+    if arg1 is not None:
+        return f"{COMMAND_NAMES[command_type]} {arg1}"
+    return COMMAND_NAMES[command_type]
@@ -0,0 +1,219 @@
+"""VM IR optimizer, run between `Parser` and `CodeWriter` with `-O`
+
+A program is a list of `(vm_file, commands)` and every command is a
+`(command_type, arg1, arg2)` tuple as `Parser` classifies it, e.g.
+`("C_PUSH", "local", 0)` or `("C_ARITHMETIC", "add", None)`.
+The optimizer only adds the command types below, `CodeWriter` knows them.
+"""
+
+# push arg1 = `(segment, index)`, pop arg2 = `(segment, index)`, no stack traffic
+C_MOVE = "C_MOVE"
+# SP--, the popped value is not needed
+C_DISCARD = "C_DISCARD"
+# `not` + `if-goto`: jump unless the popped value is true (-1)
+C_IF_NOT = "C_IF_NOT"
+
+# commands after which temp 0 may be read by code we did not scan
+BLOCK_ENDS = {
+    "C_LABEL",
+    "C_GOTO",
+    "C_IF",
+    C_IF_NOT,
+    "C_CALL",
+    "C_RETURN",
+    "C_FUNCTION",
+}
+
+BINARY = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "eq": lambda x, y: -1 if x == y else 0,
+    "gt": lambda x, y: -1 if x > y else 0,
+    "lt": lambda x, y: -1 if x < y else 0,
+}
+UNARY = {
+    "neg": lambda x: -x,
+    "not": lambda x: ~x,
+}
+
+
+def to_word(value):
+    """wrap like the Hack ALU: signed 16 bits"""
+    return (value + 0x8000) % 0x10000 - 0x8000
+
+
+def is_constant(command):
+    return command[0] == "C_PUSH" and command[1] == "constant"
+
+
+def optimize(programs):
+    """optimize every file, return `(programs, stats)`
+    - `stats` counts each rewrite, e.g. `{"fold": 3, "move": 10}`
+    """
+    stats = {"fold": 0, "move": 0, "discard": 0, "if-not": 0}
+    scratch = temp_is_scratch([commands for _, commands in programs])
+    optimized = []
+    for vm_file, commands in programs:
+        commands = fold(commands, stats)
+        if scratch:
+            commands = discard_results(commands, stats)
+        optimized.append((vm_file, commands))
+    return optimized, stats
+
+
+def fold(commands, stats):
+    """rewrite the tail of the output after every command
+    - `push constant a; push constant b; op` => `push constant (a op b)`
+    - `push constant a; neg|not` => `push constant (op a)`
+    - `push X; pop Y` => `C_MOVE`
+    - `not; if-goto L` => `C_IF_NOT`
+    """
+    out = []
+    for command in commands:
+        out.append(command)
+        changed = True
+        while changed:
+            changed = fold_tail(out, stats)
+    return out
+
+
+def fold_tail(out, stats):
+    """apply one rewrite to the end of `out`, `True` if one matched"""
+    last = out[-1]
+    command_type, arg1 = last[0], last[1]
+    if command_type == "C_ARITHMETIC":
+        if arg1 in UNARY and len(out) >= 2 and is_constant(out[-2]):
+            value = UNARY[arg1](out[-2][2])
+            out[-2:] = [("C_PUSH", "constant", to_word(value))]
+            stats["fold"] += 1
+            return True
+        if (
+            arg1 in BINARY
+            and len(out) >= 3
+            and is_constant(out[-3])
+            and is_constant(out[-2])
+        ):
+            value = BINARY[arg1](out[-3][2], out[-2][2])
+            out[-3:] = [("C_PUSH", "constant", to_word(value))]
+            stats["fold"] += 1
+            return True
+    elif command_type == "C_POP" and len(out) >= 2 and out[-2][0] == "C_PUSH":
+        source = out[-2]
+        out[-2:] = [(C_MOVE, (source[1], source[2]), (last[1], last[2]))]
+        stats["move"] += 1
+        return True
+    elif command_type == "C_IF" and out[-2:-1] == [("C_ARITHMETIC", "not", None)]:
+        out[-2:] = [(C_IF_NOT, arg1, None)]
+        stats["if-not"] += 1
+        return True
+    return False
+
+
+def temp_is_scratch(files):
+    """temp 0 is read, but only in the block that wrote it
+    - true for `JackCompiler` output (array assignment, discarded `do` results)
+    - then its value is dead at every block end
+    - a program that never reads temp 0 may leave a result there for
+      whoever inspects RAM (e.g. the course test scripts), keep it
+    """
+    read = False
+    for commands in files:
+        written = False
+        for command in commands:
+            if command[0] in BLOCK_ENDS:
+                written = False
+            elif reads_temp0(command):
+                if not written:
+                    return False
+                read = True
+            elif writes_temp0(command):
+                written = True
+    return read
+
+
+def is_temp0(command, command_type):
+    return command[0] == command_type and command[1] == "temp" and command[2] == 0
+
+
+def reads_temp0(command):
+    return is_temp0(command, "C_PUSH") or (
+        command[0] == C_MOVE and command[1] == ("temp", 0)
+    )
+
+
+def writes_temp0(command):
+    return is_temp0(command, "C_POP") or (
+        command[0] == C_MOVE and command[2] == ("temp", 0)
+    )
+
+
+def discard_results(commands, stats):
+    """`call f n; pop temp 0` => `call f n; C_DISCARD` when temp 0 is dead
+    - dead: the block ends or temp 0 is written again before any read
+    """
+    out = list(commands)
+    for i in range(1, len(out)):
+        if (
+            out[i - 1][0] == "C_CALL"
+            and is_temp0(out[i], "C_POP")
+            and dead_temp0(out, i + 1)
+        ):
+            out[i] = (C_DISCARD, None, None)
+            stats["discard"] += 1
+    return out
+
+
+def dead_temp0(commands, start):
+    for command in commands[start:]:
+        if reads_temp0(command):
+            return False
+        if writes_temp0(command) or command[0] in BLOCK_ENDS:
+            return True
+    return True
+
+
+def remove_dead_functions(programs, entry="Sys.init"):
+    """keep only functions reachable from `entry` through `call`
+    - code ahead of a file's first `function` is always kept, and so are
+      the functions it calls
+    - nothing is removed if no file defines `entry` (e.g. a single test file)
+
+    :return `(programs, removed)` with the names of the dropped functions
+    """
+    calls = {}  # function => functions it calls
+    roots = {entry}  # also called from code outside any function
+    for _, commands in programs:
+        function = None
+        for command_type, arg1, _ in commands:
+            if command_type == "C_FUNCTION":
+                function = arg1
+                calls[function] = set()
+            elif command_type == "C_CALL" and function is not None:
+                calls[function].add(arg1)
+            elif command_type == "C_CALL":
+                roots.add(arg1)
+    if entry not in calls:
+        return programs, []
+
+    reachable = set()
+    pending = list(roots)
+    while pending:
+        function = pending.pop()
+        if function not in reachable and function in calls:
+            reachable.add(function)
+            pending.extend(calls[function])
+
+    kept = []
+    for vm_file, commands in programs:
+        live = True
+        out = []
+        for command in commands:
+            if command[0] == "C_FUNCTION":
+                live = command[1] in reachable
+            if live:
+                out.append(command)
+        kept.append((vm_file, out))
+    removed = [function for function in calls if function not in reachable]
+    return kept, removed
@@ -0,0 +1,88 @@
+# comment symbol
+COMMENT = "//"
+
+# command type of every VM keyword
+COMMAND_TYPES = {
+    "add": "C_ARITHMETIC",
+    "sub": "C_ARITHMETIC",
+    "neg": "C_ARITHMETIC",
+    "eq": "C_ARITHMETIC",
+    "gt": "C_ARITHMETIC",
+    "lt": "C_ARITHMETIC",
+    "and": "C_ARITHMETIC",
+    "or": "C_ARITHMETIC",
+    "not": "C_ARITHMETIC",
+    "push": "C_PUSH",
+    "pop": "C_POP",
+    "label": "C_LABEL",
+    "goto": "C_GOTO",
+    "if-goto": "C_IF",
+    "function": "C_FUNCTION",
+    "return": "C_RETURN",
+    "call": "C_CALL",
+}
+# command types with an `int` second argument
+INDEXED = {"C_PUSH", "C_POP", "C_FUNCTION", "C_CALL"}
+
+
+# ANCHOR class Parser
+class Parser:
+    """parse a file, segregate operations per line
+    - the file is read at once and split into `commands` in one pass
+    - parsed line will be loaded into class `CodeWriter`
+
+    @param `path_to_vm_file` full path to vm file
+    """
+
+    def __init__(self, vm_file_path):
+        with open(vm_file_path, "r") as vm:
+            self.commands = self.parse(vm.read(), vm_file_path)
+        self.index = -1
+        # current command, plain attributes set by advance()
+        self.command_type = None
+        self.arg1 = None  # segment, operator, label or function name
+        self.arg2 = None  # `int` index, only `PUSH`, `POP`, `FUNCTION`, `CALL`
+
+    # API
+    # NOTE advace() must be called once
+    # before start translating since there is no current command yet
+    def advance(self):
+        self.index += 1
+        self.command_type, self.arg1, self.arg2 = self.commands[self.index]
+
+    @property
+    def has_more_commands(self):
+        return self.index + 1 < len(self.commands)
+
+    # API END
+
+    def parse(self, text, name):
+        """`(command_type, arg1, arg2)` of every command
+        - Arithmetic type: `("C_ARITHMETIC", "add", None)`
+        - Else: `("C_PUSH", "local", 0)`, `("C_RETURN", None, None)`, ...
+        """
+        commands = []
+        for line_num, line in enumerate(text.splitlines(), 1):
+            if COMMENT in line:
+                line = line[: line.index(COMMENT)]
+            words = line.split()
+            if not words:  # blank or comment only
+                continue
+            keyword = words[0].lower()
+            command_type = COMMAND_TYPES.get(keyword)
+            try:
+                if command_type == "C_ARITHMETIC":
+                    commands.append((command_type, keyword, None))
+                elif command_type == "C_RETURN":
+                    commands.append((command_type, None, None))
+                elif command_type in INDEXED:
+                    commands.append((command_type, words[1], int(words[2])))
+                elif command_type is not None:
+                    commands.append((command_type, words[1], None))
+                else:
+                    raise ValueError(f"unknown command '{words[0]}'")
+            except IndexError:
+                raise ValueError(f"{name}:{line_num}: missing argument") from None
+            except ValueError as e:
+                raise ValueError(f"{name}:{line_num}: {e}") from None
+        return commands
@@ -0,0 +1,159 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from . import optimizer
+from .code_writer import CodeWriter
+from .parser import Parser
+
+
+# ANCHOR translate
+def find_vm_files(file_path):
+    """search the tree under the working directory top-down
+    - `Foo.vm` => `[.../Foo.vm]`, `.../Foo.asm`
+    - `Foo` (a directory name) => its `.vm` files, `.../Foo/Foo.asm`
+
+    :return `(vm_files, asm_file)`, files sorted so the output is deterministic
+    """
+    vm_files, asm_file = [], None
+    path = os.getcwd()
+    if ".vm" in file_path:
+        file_name = file_path
+        for dirpath, dirnames, filenames in os.walk(path):
+            if file_name in filenames:
+                vm_file = f"{dirpath}/{file_name}"
+                vm_files = [vm_file]
+                asm_file = vm_file.replace(".vm", ".asm")
+    else:
+        dir_name = file_path
+        for dirpath, dirnames, filenames in os.walk(path):
+            if dir_name == dirpath.split("/")[-1]:
+                asm_file = f"{dirpath}/{dir_name}.asm"
+                vm_files = filter(lambda x: ".vm" in x, filenames)
+                vm_files = sorted(dirpath + "/" + vm for vm in vm_files)
+    return vm_files, asm_file
+
+
+def read_commands(vm_file):
+    """`(command_type, arg1, arg2)` of every command in the file"""
+    return Parser(vm_file).commands
+
+
+def translate_file(vm_file, commands=None, compact=False):
+    """translate one file on its own, e.g. in a worker process
+    - labels and counters are local to the file, so fragments link in any order
+    - `commands` default to reading `vm_file`
+
+    :return `(asm, routines_used, instruction_count)` fragment
+    """
+    if commands is None:
+        commands = read_commands(vm_file)
+    cw = CodeWriter(io.StringIO(), compact)
+    cw.set_file_name(vm_file)
+    for command_type, arg1, arg2 in commands:
+        cw.write_command(command_type, arg1, arg2)
+    cw.flush()
+    return cw.asm.getvalue(), cw.routines_used, cw.instruction_count
+
+
+# ANCHOR Translator
+class Translator:
+    """translate `.vm` files into one Hack program
+
+    @param `compact` see `CodeWriter`
+    @param `optimize` run `optimizer` over the commands of all files first
+    @param `whole_program` drop functions `Sys.init` never reaches
+    @param `jobs` worker processes, `None` for one per core, 1 to stay in
+    this process
+    @param `cache` `FragmentCache` to reuse unchanged files from, or `None`
+    @param `bootstrap` call `Sys.init` first, by default when there is more
+    than one file
+    """
+
+    def __init__(
+        self,
+        compact=False,
+        optimize=False,
+        whole_program=False,
+        jobs=1,
+        cache=None,
+        bootstrap=None,
+    ):
+        self.compact = compact
+        self.optimize = optimize
+        self.whole_program = whole_program
+        self.jobs = jobs
+        self.cache = cache
+        self.bootstrap = bootstrap
+        # set by translate()
+        self.stats = None  # rewrites done by `optimizer`
+        self.removed = []  # functions dropped by `whole_program`
+        self.instruction_count = 0
+
+    def translate(self, vm_files):
+        """translate every file, then link the fragments behind the bootstrap
+        - the call graph and the optimizer's temp 0 check need all files,
+          so with `whole_program` or `optimize` the files are read here first
+
+        :return `.asm` text
+        """
+        commands = [None] * len(vm_files)  # read by `translate_file()`
+        if self.whole_program or self.optimize:
+            programs = [(vm_file, read_commands(vm_file)) for vm_file in vm_files]
+            if self.whole_program:
+                programs, self.removed = optimizer.remove_dead_functions(programs)
+            if self.optimize:
+                programs, self.stats = optimizer.optimize(programs)
+            commands = [program for _, program in programs]
+        fragments = self.translate_files(vm_files, commands)
+
+        cw = CodeWriter(io.StringIO(), self.compact)
+        # NOTE if array "vm_files" has "Main.vm":
+        #         init Bootstrap + call Sys.init
+        # Simplified due to some reasons (according to moderator)
+        bootstrap = self.bootstrap
+        if bootstrap is None:
+            bootstrap = len(vm_files) > 1
+        if bootstrap:
+            cw.write_init()
+        for fragment in fragments:  # in `vm_files` order
+            cw.write_fragment(fragment)
+        cw.finish()
+        self.instruction_count = cw.instruction_count
+        return cw.asm.getvalue()
+
+    def translate_files(self, vm_files, commands):
+        """fragments of `vm_files`, from the cache where it has them"""
+        if self.cache is None:
+            return self.run_translate(vm_files, commands)
+        keys = [
+            self.cache.key(vm_file, program, self.compact)
+            for vm_file, program in zip(vm_files, commands)
+        ]
+        fragments = [self.cache.get(key) for key in keys]
+        missing = [i for i, fragment in enumerate(fragments) if fragment is None]
+        if missing:
+            translated = self.run_translate(
+                [vm_files[i] for i in missing], [commands[i] for i in missing]
+            )
+            for i, fragment in zip(missing, translated):
+                fragments[i] = fragment
+                self.cache.put(keys[i], fragment)
+            self.cache.prune()
+        return fragments
+
+    def run_translate(self, vm_files, commands):
+        args = (vm_files, commands, repeat(self.compact))
+        if self.jobs == 1 or len(vm_files) <= 1:
+            return list(map(translate_file, *args))
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            return list(pool.map(translate_file, *args))
+
+
+def translate(vm_files, **options):
+    """`.asm` text of `vm_files`, in this process unless `jobs` is given
+
+    @param `options` see `Translator`
+    """
+    return Translator(**options).translate(vm_files)
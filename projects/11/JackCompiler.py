@@ -1,26 +1,121 @@
 from compilation_engine import CompilationEngine
+from concurrent.futures import ProcessPoolExecutor
+from manifest import Manifest, source_hash
 import os
+import time
+
+
+def compile_file(jack_file):
+    """compile one class into its `.vm`, also in a worker process
+    - a class that fails leaves no `.vm` behind
+
+    :return `(jack_file, seconds, error, build)`
+    - `error` `None` or its message
+    - `build` `(hash, provides, calls)` for `Manifest.record()`, `None` on error
+    """
+    start = time.perf_counter()
+    digest = source_hash(jack_file)
+    compiler = None
+    try:
+        compiler = CompilationEngine(jack_file)  # reads the first token
+        compiler.compile_class()
+    except Exception as e:
+        if compiler:
+            compiler.vm_writer.close()
+        vm_file = jack_file.replace(".jack", ".vm")
+        if os.path.exists(vm_file):  # partial, or from an earlier build
+            os.remove(vm_file)
+        if not isinstance(e, ValueError):  # not "file:line:col: message"
+            raise
+        return jack_file, time.perf_counter() - start, str(e), None
+    build = (digest, compiler.provides, sorted(compiler.calls))
+    return jack_file, time.perf_counter() - start, None, build
 
 
 class JackCompiler:
-    def __init__(self, file_path):
+    """compile a `.jack` file or every `.jack` file of a directory
+
+    @param `jobs` worker processes, `None` for one per core, 1 to stay in
+    this process
+    @param `incremental` skip classes the directory's `Manifest` says are
+    unchanged, and recompile the callers of a subroutine whose signature
+    changed
+    """
+
+    def __init__(self, file_path, jobs=1, incremental=False):
         self.jack_files = self.parse_argv(file_path)
+        self.jobs = jobs
+        self.manifest = None
+        todo = self.jack_files
+        if incremental and self.jack_files:
+            self.manifest = Manifest(os.path.dirname(self.jack_files[0]))
+            todo = [jack for jack in todo if not self.manifest.is_fresh(jack)]
+        self.results = self.compile_files(todo)
+        if self.manifest:
+            # provides of the classes above are new, re-check the others
+            rest = [jack for jack in self.jack_files if jack not in todo]
+            self.results += self.compile_files(self.manifest.stale_callers(rest))
+            self.manifest.link([jack for jack, *_, build in self.results if build])
+            self.manifest.save()
+        self.errors = [error for _, _, error, _ in self.results if error]
 
-        for jack_file in self.jack_files:
-            compiler = CompilationEngine(jack_file)
-            compiler.compile_class()
+    def compile_files(self, jack_files):
+        """classes compile independently, one `.vm` each"""
+        if self.jobs == 1 or len(jack_files) < 2:
+            results = [compile_file(jack) for jack in jack_files]
+        else:
+            with ProcessPoolExecutor(self.jobs) as pool:
+                results = list(pool.map(compile_file, jack_files))
+        if self.manifest:
+            for jack_file, _, _, build in results:
+                if build:
+                    self.manifest.record(jack_file, *build)
+                else:
+                    self.manifest.forget(jack_file)
+        return results
 
     def parse_argv(self, file_path) -> list:
         if ".jack" in file_path:
             return [file_path]
         else:
             dirpath, dirnames, filenames = next(os.walk(file_path), [[], [], []])
-            jack_files = filter(lambda x: ".jack" in x, filenames)
-            return [file_path + "/" + jack for jack in jack_files]
+            jack_files = filter(lambda x: x.endswith(".jack"), filenames)
+            return sorted(file_path + "/" + jack for jack in jack_files)
 
 
 if __name__ == "__main__":
+    import argparse
     import sys
 
-    file_path = sys.argv[1]
-    JackCompiler(file_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Jack to VM compiler")
+    parser.add_argument("file_path", help="Foo.jack or a directory")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="worker processes for a directory (default: one per core)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="recompile every class instead of only the changed ones",
+    )
+    parser.add_argument(
+        "--timing", action="store_true", help="print the time spent on each file"
+    )
+    args = parser.parse_args()
+    start = time.perf_counter()
+    compiler = JackCompiler(
+        args.file_path, jobs=args.jobs, incremental=not args.no_cache
+    )
+    if args.timing:
+        for jack_file, seconds, error, _ in compiler.results:
+            failed = " (failed)" if error else ""
+            print(f"{seconds * 1000:8.1f} ms  {jack_file}{failed}")
+        total = (time.perf_counter() - start) * 1000
+        compiled = len(compiler.results)
+        print(f"{total:8.1f} ms  {compiled} of {len(compiler.jack_files)} files")
+    for error in compiler.errors:
+        print(error, file=sys.stderr)
+    if compiler.errors:
+        sys.exit(f"{len(compiler.errors)} of {len(compiler.jack_files)} files failed")
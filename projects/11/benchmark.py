@@ -0,0 +1,76 @@
+import glob
+import os
+import tempfile
+import timeit
+import tracemalloc
+
+from jack_tokenizer import JackTokenizer
+
+# e.g. python benchmark.py        (the OS sources of project 12)
+root = os.path.dirname(os.path.abspath(__file__))
+repeat = 5
+sizes = [1, 4, 16]  # the whole OS concatenated n times, as one "class"
+
+
+class ListTokenizer(JackTokenizer):
+    """every token read up front and consumed with `pop(0)`, as `advance()`
+    used to
+    """
+
+    def __init__(self, jack_file_path):
+        super().__init__(jack_file_path)
+        self.token_list = [*self.tokens]
+        self.next_token = self.token_list.pop(0) if self.token_list else None
+
+    def advance(self):
+        self.curr_token = self.next_token
+        if len(self.token_list) > 0:
+            self.next_token = self.token_list.pop(0)
+        else:
+            self.next_token = None
+
+
+def drain(tokenizer_class, jack_file):
+    """tokenize, then walk every token the way `CompilationEngine` does"""
+    tokenizer = tokenizer_class(jack_file)
+    count = 0
+    while tokenizer.has_more_tokens():
+        tokenizer.next_value()
+        tokenizer.advance()
+        tokenizer.curr_value()
+        count += 1
+    return count
+
+
+def peak(tokenizer_class, jack_file):
+    """peak memory of `drain()` in KiB"""
+    tracemalloc.start()
+    drain(tokenizer_class, jack_file)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def best(statement):
+    """Best wall time of `repeat` runs in milliseconds"""
+    return min(timeit.repeat(statement, number=1, repeat=repeat)) * 1000
+
+
+os_source = ""
+for jack_file in sorted(glob.glob(f"{root}/../12/*.jack")):
+    with open(jack_file) as jack:
+        os_source += jack.read()
+
+with tempfile.TemporaryDirectory() as directory:
+    for size in sizes:
+        jack_file = f"{directory}/OS{size}.jack"
+        with open(jack_file, "w") as jack:
+            jack.write(os_source * size)
+        count = drain(JackTokenizer, jack_file)
+        popped = best(lambda: drain(ListTokenizer, jack_file))
+        streamed = best(lambda: drain(JackTokenizer, jack_file))
+        listed_peak = peak(ListTokenizer, jack_file)
+        streamed_peak = peak(JackTokenizer, jack_file)
+        print(f"OS x{size}: {count} tokens")
+        print(f"  list.pop(0) : {popped:8.2f} ms {listed_peak:8.0f} KiB")
+        print(f"  streaming   : {streamed:8.2f} ms {streamed_peak:8.0f} KiB")
@@ -24,20 +24,24 @@ class CompilationEngine:
     """
 
     def __init__(self, jack_file):
-        self.vm_writer = VMWriter(jack_file)
+        # tokenizer first: its first token can already be an error
         self.tokenizer = JackTokenizer(jack_file)
+        self.vm_writer = VMWriter(jack_file)
         self.symbol_table = SymbolTable()
 
         self.if_index = -1
         self.while_index = -1
+        # for the incremental build, see `manifest.Manifest`
+        self.provides = {}  # "Class.sub" => "kind nArgs"
+        self.calls = set()  # "Class.sub" called through compile_subroutine_call
 
     # 'class' className '{' classVarDec* subroutineDec* '}'
     def compile_class(self):
         #! Beginning of all
         # * save name of the class and move on
-        self.load_next_token()  # 'class'
+        self.expect("class")
         self.class_name = self.load_next_token()  # className
-        self.load_next_token()  # curr_token = '{'
+        self.expect("{")
 
         # while next token == 'static' | 'field',
         while self.is_class_var_dec():  # check next token
@@ -54,10 +58,10 @@ class CompilationEngine:
         name = self.load_next_token()  # curr_token = varName
         self.symbol_table.define(name, type, kind.upper())
         while self.check_next_token() != ";":  # (',' varName)*
-            self.load_next_token()  # ','
+            self.expect(",")
             name = self.load_next_token()  # varName
             self.symbol_table.define(name, type, kind.upper())
-        self.load_next_token()  # ';'
+        self.expect(";")
         # next_token = 'constructor' | 'function' | 'method'
 
     # subroutineDec: ('constructor' | 'function' | 'method') ('void' | type) subroutineName '(' parameterList ')' subroutineBody
@@ -73,18 +77,20 @@ class CompilationEngine:
         if subroutine_kind == "method":
             self.symbol_table.define("instance", self.class_name, "ARG")
 
-        self.load_next_token()  # curr_token '('
+        self.expect("(")
         self.compile_parameter_list()  # parameterList
         # next_token == ')' when escaped
-        self.load_next_token()  # ')'
-        self.load_next_token()  # '{'
+        self.expect(")")
+        num_args = self.symbol_table.counts["ARG"]  # with 'instance' of a method
+        func_name = f"{self.class_name}.{subroutine_name}"  # Main.main
+        self.provides[func_name] = f"{subroutine_kind} {num_args}"
+        self.expect("{")
         while self.check_next_token() == "var":
             self.compile_var_dec()  # varDec*
         # NOTE next_token is neither 'var' or ';'
         # NOTE next_token is statements* (zero or more)
 
         # ANCHOR actual writing
-        func_name = f"{self.class_name}.{subroutine_name}"  # Main.main
         num_locals = self.symbol_table.counts["VAR"]  # get 'var' count
         self.vm_writer.write_function(func_name, num_locals)
         if subroutine_kind == "constructor":
@@ -98,7 +104,7 @@ class CompilationEngine:
 
         # NOTE statement starts here
         self.compile_statements()  # statements
-        self.load_next_token()  # '}
+        self.expect("}")
 
         # ( (type varName) (',' type varName)*)?
 
@@ -109,7 +115,7 @@ class CompilationEngine:
             name = self.load_next_token()  # varName
             self.symbol_table.define(name, type, "ARG")
         while self.check_next_token() != ")":
-            self.load_next_token()  # ','
+            self.expect(",")
             type = self.load_next_token()  # type
             name = self.load_next_token()  # varName
             self.symbol_table.define(name, type, "ARG")
@@ -118,15 +124,15 @@ class CompilationEngine:
         # 'var' type varName (',' varName)* ';'
 
     def compile_var_dec(self):
-        self.load_next_token()  # 'var'
+        self.expect("var")
         type = self.load_next_token()  # type
         name = self.load_next_token()  #  # varName
         self.symbol_table.define(name, type, "VAR")
         while self.check_next_token() != ";":  # (',' varName)*
-            self.load_next_token()  # ','
+            self.expect(",")
             name = self.load_next_token()  # varName
             self.symbol_table.define(name, type, "VAR")
-        self.load_next_token()  # ';'
+        self.expect(";")
 
     # statement*
     # letStatement | ifStatement | whileStatement | doStatement | returnStatement
@@ -151,28 +157,27 @@ class CompilationEngine:
 
     def compile_let(self):
         var_name = self.load_next_token()  # curr_token == varName
-        var_kind = CONVERT_KIND[self.symbol_table.kind_of(var_name)]
-        var_index = self.symbol_table.index_of(var_name)
+        var_kind, var_index = self.resolve(var_name)
         # if next_token == "["
         if self.is_array():  # array assignment
-            self.load_next_token()  # curr_token == '['
+            self.expect("[")
             self.compile_expression()  # expression
-            self.load_next_token()  # curr_token == ']'
+            self.expect("]")
             self.vm_writer.write_push(var_kind, var_index)
             self.vm_writer.write_arithmetic("ADD")
 
-            self.load_next_token()  # curr_token == '='
+            self.expect("=")
             self.compile_expression()  # expression
-            self.load_next_token()  # curr_token == ';'
+            self.expect(";")
             #! POP TEMP and PUSH TEMP location changed
             self.vm_writer.write_pop("TEMP", 0)
             self.vm_writer.write_pop("POINTER", 1)
             self.vm_writer.write_push("TEMP", 0)
             self.vm_writer.write_pop("THAT", 0)
         else:  # regular assignment
-            self.load_next_token()  # curr_token == '='
+            self.expect("=")
             self.compile_expression()  # expression
-            self.load_next_token()  # ';'
+            self.expect(";")
             self.vm_writer.write_pop(var_kind, var_index)
 
     # 'if' '(' expression ')' '{' statements '}' ( 'else' '{' statements '}' )?
@@ -181,23 +186,23 @@ class CompilationEngine:
         self.if_index += 1
         if_index = self.if_index
         # TODO IF indexes count separately
-        self.load_next_token()  # curr_token == '('
+        self.expect("(")
         self.compile_expression()  # expression
-        self.load_next_token()  # ')'
-        self.load_next_token()  # '{'
+        self.expect(")")
+        self.expect("{")
         # S = statement, L = label
         self.vm_writer.write_if(f"IF_TRUE{if_index}")  #! if-goto L1
         self.vm_writer.write_goto(f"IF_FALSE{if_index}")  #! goto L2
         self.vm_writer.write_label(f"IF_TRUE{if_index}")  #! label L1
         self.compile_statements()  # statements #! executing S1
         self.vm_writer.write_goto(f"IF_END{if_index}")  #! goto END
-        self.load_next_token()  # '}'
+        self.expect("}")
         self.vm_writer.write_label(f"IF_FALSE{if_index}")  #! label L2
         if self.check_next_token() == "else":  # ( 'else' '{' statements '}' )?
-            self.load_next_token()  # 'else'
-            self.load_next_token()  # '{'
+            self.expect("else")
+            self.expect("{")
             self.compile_statements()  # statements #! executing S2
-            self.load_next_token()  # '}'
+            self.expect("}")
         self.vm_writer.write_label(f"IF_END{if_index}")
 
     # 'while' '(' expression ')' '{' statements '}'
@@ -206,16 +211,16 @@ class CompilationEngine:
         self.while_index += 1
         while_index = self.while_index
         self.vm_writer.write_label(f"WHILE{while_index}")
-        self.load_next_token()  # '('
+        self.expect("(")
         self.compile_expression()  # expression
         self.vm_writer.write_arithmetic("NOT")  # eval false condition first
-        self.load_next_token()  # ')'
-        self.load_next_token()  # '{'
+        self.expect(")")
+        self.expect("{")
         self.vm_writer.write_if(f"WHILE_END{while_index}")
         self.compile_statements()  # statements
         self.vm_writer.write_goto(f"WHILE{while_index}")
         self.vm_writer.write_label(f"WHILE_END{while_index}")
-        self.load_next_token()  # '}'
+        self.expect("}")
 
         # 'do' subroutineCall ';'
 
@@ -224,7 +229,7 @@ class CompilationEngine:
         self.load_next_token()  #! to sync with compile_term()
         self.compile_subroutine_call()
         self.vm_writer.write_pop("TEMP", 0)
-        self.load_next_token()  # ';'
+        self.expect(";")
 
         # 'return' expression? ';'
 
@@ -235,7 +240,7 @@ class CompilationEngine:
         else:
             self.vm_writer.write_push("CONST", 0)
         self.vm_writer.write_return()
-        self.load_next_token()  # ';'
+        self.expect(";")
 
     # term (op term)*
     def compile_expression(self):
@@ -260,9 +265,9 @@ class CompilationEngine:
             self.vm_writer.write_arithmetic(ARITHMETIC_UNARY[unary_op])
         # if next_token == '(' => '(' expression ')'
         elif self.check_next_token() == "(":
-            self.load_next_token()  # '('
+            self.expect("(")
             self.compile_expression()  # expression
-            self.load_next_token()  # ')'
+            self.expect(")")
         # if next_token == INTEGER(const)
         elif self.check_next_type() == "INT_CONST":  # integerConstant
             self.vm_writer.write_push("CONST", self.load_next_token())  # )
@@ -270,8 +275,14 @@ class CompilationEngine:
         elif self.check_next_type() == "STRING_CONST":  # stringConstant
             self.compile_string()
         # if next_token == KEYWORD(const)
-        elif self.check_next_type() == "KEYWORD":  # keywordConstant
+        elif self.is_keyword_constant():  # keywordConstant
             self.compile_keyword()
+        # e.g. ';' in "return 1 +;", it would be read as a varName below
+        elif self.check_next_type() != "IDENTIFIER":
+            raise self.tokenizer.error(
+                f"expected a term, got '{self.check_next_token()}'",
+                self.tokenizer.next_token,
+            )
         # varName | varName '[' expression ']' | subroutineCall
         else:
             #! (varName | varName for expression | subroutine)'s base
@@ -280,12 +291,11 @@ class CompilationEngine:
             #! next_token == '[' | '(' or '.' | just varName
             # varName '[' expression ']'
             if self.is_array():  # if next_token == '['
-                self.load_next_token()  # '['
+                array_kind, array_index = self.resolve(var_name)
+                self.expect("[")
                 self.compile_expression()  # expression
-                self.load_next_token()  # ']'
-                array_kind = self.symbol_table.kind_of(var_name)
-                array_index = self.symbol_table.index_of(var_name)
-                self.vm_writer.write_push(CONVERT_KIND[array_kind], array_index)
+                self.expect("]")
+                self.vm_writer.write_push(array_kind, array_index)
                 self.vm_writer.write_arithmetic("ADD")
                 self.vm_writer.write_pop("POINTER", 1)
                 self.vm_writer.write_push("THAT", 0)
@@ -300,8 +310,7 @@ class CompilationEngine:
                 # curr_token == varName
                 # FIXME cannot catch subroutine call and pass it to 'else' below
                 # TODO error caught on Math.abs() part on Ball.vm
-                var_kind = CONVERT_KIND[self.symbol_table.kind_of(var_name)]
-                var_index = self.symbol_table.index_of(var_name)
+                var_kind, var_index = self.resolve(var_name)
                 self.vm_writer.write_push(var_kind, var_index)
 
     # subroutineCall: subroutineName '(' expressionList ')' |
@@ -318,7 +327,7 @@ class CompilationEngine:
         number_args = 0
         #! '.' or '(' 2 cases
         if self.check_next_token() == ".":
-            self.load_next_token()  # curr_token == '.'
+            self.expect(".")
             subroutine_name = self.load_next_token()  # curr_token == subroutineName
             type = self.symbol_table.type_of(subroutine_caller)
             if type != "NONE":  # it's an instance
@@ -335,10 +344,11 @@ class CompilationEngine:
             function_name = f"{self.class_name}.{subroutine_name}"
             number_args += 1
             self.vm_writer.write_push("POINTER", 0)
-        self.load_next_token()  # '('
+        self.expect("(")
         number_args += self.compile_expression_list()  # expressionList
-        self.load_next_token()  # ')'
+        self.expect(")")
         self.vm_writer.write_call(function_name, number_args)
+        self.calls.add(function_name)
 
     # (expression (',' expression)* )?
     def compile_expression_list(self):
@@ -348,7 +358,7 @@ class CompilationEngine:
             self.compile_expression()
         while self.check_next_token() != ")":
             number_args += 1
-            self.load_next_token()  # curr_token == ','
+            self.expect(",")
             self.compile_expression()
         return number_args
 
@@ -387,21 +397,37 @@ class CompilationEngine:
     def is_op(self):
         return self.check_next_token() in ["+", "-", "*", "/", "&", "|", "<", ">", "="]
 
+    def is_keyword_constant(self):
+        return self.check_next_token() in ["true", "false", "null", "this"]
+
     def is_unary_op_term(self):
         return self.check_next_token() in ["~", "-"]
 
     def check_next_token(self):
-        return self.tokenizer.next_token[1]
+        return self.tokenizer.next_value()
 
     def check_next_type(self):
-        return self.tokenizer.next_token[0]
+        return self.tokenizer.next_type()
 
     def get_curr_token(self):
-        return self.tokenizer.curr_token[1]
+        return self.tokenizer.curr_value()
 
     def load_next_token(self):
-        if self.tokenizer.has_more_tokens():
-            self.tokenizer.advance()  # curr_token = next_token
-            return self.tokenizer.curr_token[1]
-        else:
-            return ""
+        if not self.tokenizer.has_more_tokens():
+            raise self.tokenizer.error("unexpected end of file")
+        self.tokenizer.advance()  # curr_token = next_token
+        return self.tokenizer.curr_value()
+
+    def expect(self, token):
+        """load the next token, which the grammar says must be `token`"""
+        if self.load_next_token() != token:
+            raise self.tokenizer.error(
+                f"expected '{token}', got '{self.get_curr_token()}'"
+            )
+
+    def resolve(self, var_name):
+        """`(segment, index)` of a variable, error if it is not defined"""
+        kind = self.symbol_table.kind_of(var_name)
+        if kind == "NONE":
+            raise self.tokenizer.error(f"undefined variable '{var_name}'")
+        return CONVERT_KIND[kind], self.symbol_table.index_of(var_name)
@@ -1,32 +1,47 @@
+import mmap
 import re
 
 # ANCHOR RegEx
+# each alternative is a named group, `match.lastgroup` tells which one matched
+# NOTE patterns are bytes: the scanner runs over the memory-mapped file
+# a comment, skipped by the scanner: "//" to the end of line or "/*" to "*/"
+COMMENT = rb"(?P<COMMENT>//[^\n]*|/\*.*?\*/)"
 # positive lookahead/lookbehind: no character should found before/after the keyword
-KEYWORD = r"(?<![\w])(class|constructor|function|method|field|static|var|int|char|boolean|void|true|false|null|this|let|do|if|else|while|return)(?![\w])"
+KEYWORD = rb"(?<![\w])(?P<KEYWORD>class|constructor|function|method|field|static|var|int|char|boolean|void|true|false|null|this|let|do|if|else|while|return)(?![\w])"
 # Nothing special about symbols
-SYMBOL = r"([{}()[\].,;+\-*/&|<>=~])"
+SYMBOL = rb"(?P<SYMBOL>[{}()[\].,;+\-*/&|<>=~])"
 # Match INT_CONST if no word character right before/after digits (*max num 32767 is not considered)
-INT_CONST = r"(?<![\w])(\d+)(?![\w])"
-# Any character between double quote: () <- automatically exclude double quotes
-STRING_CONST = r'"([^\n]*)"'
+INT_CONST = rb"(?<![\w])(?P<INT_CONST>\d+)(?![\w])"
+# Any character but a double quote between double quotes, on one line
+STRING_CONST = rb'"(?P<STRING_CONST>[^"\n]*)"'
 # A sequence of letters, digits, and underscore not starting with a digit
-IDENTIFIER = r"([_a-zA-Z]\w*)"
+IDENTIFIER = rb"(?P<IDENTIFIER>[_a-zA-Z]\w*)"
+# counted for token positions, other whitespace is skipped by finditer
+NEWLINE = rb"(?P<NEWLINE>\n)"
+# what is left of a "/*" or '"' that COMMENT or STRING_CONST could not close
+UNTERMINATED = rb'(?P<UNTERMINATED>/\*|")'
+# anything else that is not whitespace, e.g. "#"
+ERROR = rb"(?P<ERROR>\S)"
 
-# leftmost checked first, so IDENTIFIER comes last
-LEXICAL_ELEMENTS = f"{KEYWORD}|{SYMBOL}|{INT_CONST}|{STRING_CONST}|{IDENTIFIER}"
-# the list below matches the order of LEXICAL_ELEMENTS above
-LEXICAL_ELEMENTS_LIST = ["KEYWORD", "SYMBOL", "INT_CONST", "STRING_CONST", "IDENTIFIER"]
+# leftmost checked first: COMMENT before STRING_CONST before UNTERMINATED
+# before SYMBOL ("/"), and IDENTIFIER last
+LEXICAL_ELEMENTS = b"|".join(
+    [COMMENT, KEYWORD, STRING_CONST, UNTERMINATED, SYMBOL, INT_CONST, IDENTIFIER]
+    + [NEWLINE, ERROR]
+)
 
 # ANCHOR Compile RegEx
-LEXICAL_ELEMENTS_REGEX = re.compile(LEXICAL_ELEMENTS)
-SINGLE_LINE_COMMENT_REGEX = re.compile(r"//.*")
-MULTI_LINE_COMMENT_REGEX = re.compile(r"/\*.*?\*/", flags=re.DOTALL)
+LEXICAL_ELEMENTS_REGEX = re.compile(LEXICAL_ELEMENTS, flags=re.DOTALL)
 
 
 class JackTokenizer:
     """Handles the compiler's input
     - Parse all tokens one token at a time
     - Getting the value and type of current token
+
+    tokens are `(type, token, line, col)` tuples pulled one at a time from
+    `scan()`, only `curr_token` and `next_token` are held in memory
+    - equal values share one str from `table`
     """
 
     def __init__(self, jack_file_path):
@@ -35,15 +50,15 @@ class JackTokenizer:
         @param
         - input file / stream
         """
-        self.jack = open(jack_file_path, "r")  # open Jack file
-        self.jack_file = self.jack.read()  # read whole file
-        self.tokens = self.tokenize()  # retreive all tokens
-        self.next_token = self.tokens.pop(0)  # load first token in next_token
-        self.jack.close()  # close IO stream once all tokens are extracted
+        self.jack_file_path = jack_file_path
+        self.table = {}  # raw bytes => decoded value
+        self.tokens = self.scan()  # generator, reads the file on demand
+        self.curr_token = None
+        self.next_token = next(self.tokens, None)  # load first token
 
     # ANCHOR API
     def has_more_tokens(self):
-        return bool(self.next_token)
+        return self.next_token is not None
 
     def advance(self):
         """Gets next token from the input and makes it the current token
@@ -51,40 +66,67 @@ class JackTokenizer:
         NOTE: this method should be called only `if` `has_more_tokens == true`
         """
         self.curr_token = self.next_token
-        if len(self.tokens) > 0:
-            self.next_token = self.tokens.pop(0)
-        else:
-            self.next_token = None
+        self.next_token = next(self.tokens, None)
+
+    def next_type(self):
+        return self.field(self.next_token, 0)
+
+    def next_value(self):
+        return self.field(self.next_token, 1)
+
+    def curr_value(self):
+        return self.field(self.curr_token, 1)
 
-    def tokenize(self):
-        """remove comments and tokenize whole file
+    def field(self, token, index):
+        """`token[index]`, `token` is None past the end"""
+        if token is None:
+            raise self.error("unexpected end of file")
+        return token[index]
+
+    def error(self, message, token=None):
+        """`ValueError` "file:line:col: message" at `token`, the current one
+        by default
+        """
+        token = token or self.curr_token or self.next_token
+        line, col = token[2:] if token else (1, 1)
+        return ValueError(f"{self.jack_file_path}:{line}:{col}: {message}")
+
+    def scan(self):
+        """tokenize the memory-mapped file lazily, skipping comments as they
+        are met
         @return
-        - tuple (token, type) of tokens
+        - generator of `(type, token, line, col)`, line and col from 1
         """
-        trimmed_file = self.remove_comments()
-        #! IMPORTANT TO REMEMBER
-        # NOTE re.findall() will return an array of all non-overlapping regex matches in the string. “Non-overlapping” means that the string is searched through from left to right, and the next match attempt starts beyond the previous match. If the regex contains one or more capturing groups, re.findall() returns an array of tuples, with each tuple containing text matched by all the capturing groups
-        token_tuples = LEXICAL_ELEMENTS_REGEX.findall(trimmed_file)
-        types = map(
-            lambda token_tuple: LEXICAL_ELEMENTS_LIST[
-                next(index for index, value in enumerate(token_tuple) if value)
-            ],
-            token_tuples,
-        )
-        tuples_to_tokens = map(
-            lambda token: next(value for index, value in enumerate(token) if value),
-            token_tuples,
-        )
-        # NOTE The zip() function returns a zip object, which is an iterator of tuples where the first item in each passed iterator is paired together, and then the second item in each passed iterator are paired together etc.
-        token_type_tuples = zip(types, tuples_to_tokens)
-        # Convert to list by unpacking
-        return [*token_type_tuples]
-
-    def remove_comments(self):
-        remove_single_line_comments = re.sub(
-            SINGLE_LINE_COMMENT_REGEX, "", self.jack_file
-        )
-        remove_multi_line_comments = re.sub(
-            MULTI_LINE_COMMENT_REGEX, "", remove_single_line_comments
-        )
-        return remove_multi_line_comments
+        with open(self.jack_file_path, "rb") as jack:
+            if not jack.seek(0, 2):  # an empty file can't be mapped
+                return
+            with mmap.mmap(jack.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                yield from self.scan_source(source)
+
+    def scan_source(self, source):
+        """`scan()` over `source`, any bytes-like object"""
+        table = self.table
+        line, line_start = 1, 0
+        for match in LEXICAL_ELEMENTS_REGEX.finditer(source):
+            kind = match.lastgroup
+            if kind == "NEWLINE":
+                line += 1
+                line_start = match.end()
+            elif kind == "COMMENT":
+                comment = match.group()
+                if b"\n" in comment:  # /* spanning lines */
+                    line += comment.count(b"\n")
+                    line_start = match.start() + comment.rfind(b"\n") + 1
+            elif kind == "UNTERMINATED" or kind == "ERROR":
+                char = match.group().decode(errors="replace")
+                position = (kind, char, line, match.start() - line_start + 1)
+                if kind == "ERROR":
+                    raise self.error(f"unexpected character {char!r}", position)
+                what = "comment" if char == "/*" else "string"
+                raise self.error(f"unterminated {what}", position)
+            else:
+                raw = match.group(kind)
+                value = table.get(raw)
+                if value is None:
+                    value = table[raw] = raw.decode()
+                yield kind, value, line, match.start() - line_start + 1
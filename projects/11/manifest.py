@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+
+# the compiler itself, its source is part of the manifest version
+COMPILER_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILER_FILES = [
+    "compilation_engine.py",
+    "jack_tokenizer.py",
+    "symbol_table.py",
+    "vm_writer.py",
+]
+# kept next to the .jack files it describes
+MANIFEST_NAME = ".jack_manifest.json"
+
+
+def compiler_version():
+    """hash of the compiler source, a new compiler rebuilds every class"""
+    digest = hashlib.sha256()
+    for module in COMPILER_FILES:
+        with open(os.path.join(COMPILER_DIR, module), "rb") as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def source_hash(jack_file):
+    with open(jack_file, "rb") as jack:
+        return hashlib.sha256(jack.read()).hexdigest()
+
+
+# ANCHOR Manifest
+class Manifest:
+    """what the last build of a directory produced, one entry per `.jack`
+    - `hash` of the source
+    - `provides` `{"Class.sub": "kind nArgs"}` it declares
+    - `calls` `{"Class.sub": signature}` it calls, with the callee's
+      signature when it was compiled (`None` if not in the directory)
+
+    @param `directory` where the manifest is kept
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.version = compiler_version()
+        self.entries = self.load()
+
+    def load(self):
+        """entries by file name, empty if missing, broken or from another
+        compiler version
+        """
+        try:
+            with open(self.path) as manifest:
+                data = json.load(manifest)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != self.version:
+            return {}
+        return data.get("files", {})
+
+    def save(self):
+        # drop classes whose source is gone
+        directory = os.path.dirname(self.path)
+        self.entries = {
+            name: entry
+            for name, entry in self.entries.items()
+            if os.path.exists(os.path.join(directory, name))
+        }
+        with open(self.path, "w") as manifest:
+            data = {"version": self.version, "files": self.entries}
+            json.dump(data, manifest, indent=1, sort_keys=True)
+
+    def is_fresh(self, jack_file):
+        """unchanged since its `.vm` was written"""
+        entry = self.entries.get(os.path.basename(jack_file))
+        return (
+            entry is not None
+            and os.path.exists(jack_file.replace(".jack", ".vm"))
+            and entry["hash"] == source_hash(jack_file)
+        )
+
+    def signatures(self):
+        """`{"Class.sub": signature}` of every class in the manifest"""
+        signatures = {}
+        for entry in self.entries.values():
+            signatures.update(entry["provides"])
+        return signatures
+
+    def stale_callers(self, jack_files):
+        """`jack_files` that called a subroutine whose signature has changed"""
+        signatures = self.signatures()
+        stale = []
+        for jack_file in jack_files:
+            entry = self.entries.get(os.path.basename(jack_file))
+            if entry and any(
+                signatures.get(callee) != signature
+                for callee, signature in entry["calls"].items()
+            ):
+                stale.append(jack_file)
+        return stale
+
+    def record(self, jack_file, digest, provides, calls):
+        """entry of a class just compiled, `link()` fills in its `calls`"""
+        self.entries[os.path.basename(jack_file)] = {
+            "hash": digest,
+            "provides": provides,
+            "calls": dict.fromkeys(sorted(calls)),
+        }
+
+    def link(self, jack_files):
+        """fill in the signatures `record()` left out, once every class
+        of this build has its entry
+        """
+        signatures = self.signatures()
+        for jack_file in jack_files:
+            calls = self.entries[os.path.basename(jack_file)]["calls"]
+            for callee in calls:
+                calls[callee] = signatures.get(callee)
+
+    def forget(self, jack_file):
+        self.entries.pop(os.path.basename(jack_file), None)
@@ -1,12 +1,12 @@
 class SymbolTable:
-    # STATIC and FIELD have a class scope
-    # ARG and VAR have a subroutine scope
-    counts = {"STATIC": 0, "FIELD": 0, "ARG": 0, "VAR": 0}
-
     def __init__(self):
         # Create a new symbol table
         self.class_scope = {}
         self.subroutine = {}
+        # STATIC and FIELD have a class scope
+        # ARG and VAR have a subroutine scope
+        # NOTE per table, a class attribute would carry counts into the next class
+        self.counts = {"STATIC": 0, "FIELD": 0, "ARG": 0, "VAR": 0}
 
     def start_subroutine(self):
         """Starts a new subroutine scope (reset symbol table)"""